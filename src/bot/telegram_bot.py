@@ -843,7 +843,7 @@ class TelegramBot:
                     return
 
             # Добавляем задачу в базу данных
-            task_id = self.db.add_task(message.text, user.id)
+            task_id, created = self.db.add_task(message.text, user.id)
             if not task_id:
                 # Если не удалось добавить задачу, возвращаем использованный запрос
                 if not user.is_admin and subscription_info['type'] != 'unlimited':
@@ -851,6 +851,18 @@ class TelegramBot:
                 await message.answer("❌ Ошибка при добавлении задачи. Попробуйте позже.")
                 return
 
+            if not created:
+                # Такая задача уже в очереди - повторная ссылка не должна списывать запрос
+                if not user.is_admin and subscription_info['type'] != 'unlimited':
+                    self.db.decrement_requests_used(user.id)
+                await message.answer(
+                    "ℹ️ *Эта ссылка уже ожидает обработки.*\n\n"
+                    "Запрос не списан, результаты будут отправлены автоматически.",
+                    reply_markup=get_main_keyboard(),
+                    parse_mode="Markdown"
+                )
+                return
+
             # Отправляем сообщение о успешном добавлении задачи
             await message.answer(
                 "✅ *Задача добавлена в очередь на обработку.*\n\n"
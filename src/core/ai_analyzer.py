@@ -17,6 +17,22 @@ class AIAnalyzer:
         
         if not self.openai_api_key:
             logger.error("API ключ OpenAI не найден. Пожалуйста, добавьте OPENAI_API_KEY в .env файл")
+        
+        # Клиент создается один раз и переиспользует пул соединений между запросами
+        self._client = None
+    
+    def _get_client(self) -> OpenAI:
+        """
+        Получение клиента OpenAI (создается при первом обращении)
+        
+        :return: Клиент OpenAI
+        """
+        if self._client is None:
+            self._client = OpenAI(
+                api_key=self.openai_api_key,
+                base_url=self.openai_base_url
+            )
+        return self._client
     
     def analyze_relevance(self, ozon_product: dict, alibaba_products: list, threshold: int = 60) -> dict:
         """
@@ -36,11 +52,8 @@ class AIAnalyzer:
             
             logger.info("Начинаем анализ релевантности товаров...")
             
-            # Создаем клиент OpenAI
-            client = OpenAI(
-                api_key=self.openai_api_key,
-                base_url=self.openai_base_url
-            )
+            # Получаем клиент OpenAI
+            client = self._get_client()
             
             logger.info("Анализируем товары по релевантности...")
             
@@ -169,10 +182,7 @@ class AIAnalyzer:
             - Не добавляй никаких пояснений
             """
             
-            client = OpenAI(
-                api_key=self.openai_api_key,
-                base_url=self.openai_base_url
-            )
+            client = self._get_client()
             
             response = client.chat.completions.create(
                 model="gpt-4",
@@ -2,21 +2,238 @@
 # -*- coding: utf-8 -*-
 
 import os
+import shutil
 import time
-import requests
 import json
 import random
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException, WebDriverException, StaleElementReferenceException
 from selenium.webdriver.common.action_chains import ActionChains
-from src.utils.logger import logger
+from src.utils.logger import logger, is_debug_enabled
 from src.core.ai_analyzer import AIAnalyzer
 import asyncio
 import re
 import signal
 import atexit
+import threading
+
+# Подстроки текста кнопок окна блокировки (в нижнем регистре)
+MANAGE_BUTTON_NEEDLES = ("правл", "anage", "настро")
+CLOSE_BUTTON_NEEDLES = ("отово", "gotit", "ontinue", "азре")
+
+# Селекторы карточек в результатах поиска
+SEARCH_RESULTS_CSS = ".space-offer-card-box, .space-offer-card, .sm-offer-item, .offer-item, .card-container, .normalcommon-offer-card"
+SEARCH_RESULTS_LOCATOR = (By.CSS_SELECTOR, SEARCH_RESULTS_CSS)
+PRODUCT_CARD_CSS = ".normalcommon-offer-card"
+PRODUCT_CARD_LOCATOR = (By.CSS_SELECTOR, PRODUCT_CARD_CSS)
+# Максимальное количество обрабатываемых карточек товаров
+MAX_PRODUCT_CARDS = 15
+
+# Локаторы элементов страницы поиска, окна блокировки и капчи
+BLOCKED_POPUP_LOCATOR = (By.XPATH, "//div[contains(text(), 'заблокированы') or contains(text(), 'blocked')]")
+BUTTON_LOCATOR = (By.TAG_NAME, "button")
+IMG_LOCATOR = (By.TAG_NAME, "img")
+UPLOAD_INPUT_LOCATOR = (By.ID, "img-search-upload")
+SEARCH_BUTTON_LOCATOR = (By.CSS_SELECTOR, ".search-btn")
+CAPTCHA_CONTAINER_LOCATOR = (By.CLASS_NAME, "J_MIDDLEWARE_FRAME_WIDGET")
+CAPTCHA_CLOSE_LOCATOR = (By.CSS_SELECTOR, ".J_MIDDLEWARE_FRAME_WIDGET img")
+CAPTCHA_SLIDER_CSS = ".nc_iconfont.btn_slide"
+CAPTCHA_TRACK_CSS = ".nc-lang-cnt"
+
+# Цена после символа юаня в тексте карточки и первое число в тексте цены (с разделителями тысяч)
+YUAN_PRICE_RE = re.compile(r'¥\s*(\d[\d,]*(?:\.\d+)?)')
+PRICE_NUMBER_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# Текущий URL и количество найденных карточек за один вызов execute_script
+SEARCH_STATE_JS = "return {url: window.location.href, results: document.querySelectorAll(arguments[0]).length};"
+
+# Поля карточки товара: поле -> (CSS селектор, 'text' или имя атрибута)
+CARD_FIELDS_SPEC = {
+    'title': (".mojar-element-title .title", "text"),
+    'url': (".mojar-element-title a", "href"),
+    'company_name': (".mojar-element-company .company-name", "text"),
+    'sales': (".mojar-element-price .count", "text"),
+    'shop_years': (".credit-tag", "text"),
+    'repurchase_rate': (".shop-repurchase-rate", "text"),
+    'image_style': (".img", "style"),
+    'price': (".mojar-element-price .price", "text"),
+}
+
+# Извлечение полей первых arguments[1] карточек (селектор arguments[0]) по спецификации arguments[2].
+# Карточки ищутся в самом скрипте, поэтому он выполняется через CDP без передачи элементов.
+# Для атрибутов, как и в get_attribute Selenium, сначала берется строковое свойство
+# элемента (например, абсолютный href), затем атрибут
+CARDS_FIELDS_JS = """
+var cards = Array.prototype.slice.call(document.querySelectorAll(arguments[0]), 0, arguments[1]);
+var spec = arguments[2];
+return cards.map(function(card) {
+    var out = {};
+    for (var key in spec) {
+        var el = card.querySelector(spec[key][0]), attr = spec[key][1];
+        if (!el) { out[key] = null; continue; }
+        if (attr === 'text') { out[key] = (el.innerText || '').trim(); continue; }
+        var prop = el[attr];
+        out[key] = typeof prop === 'string' ? prop : el.getAttribute(attr);
+    }
+    return out;
+});
+"""
+
+# Диагностика карточки без цены (селектор карточек arguments[0], индекс arguments[1]):
+# HTML карточки, элементы с price в классе и текстовые узлы с ¥
+PRICE_DEBUG_JS = """
+var card = document.querySelectorAll(arguments[0])[arguments[1]];
+if (!card) return {};
+var out = {html: card.outerHTML, price: [], yuan: []};
+card.querySelectorAll('[class*="price"], [class*="Price"]').forEach(function(el) {
+    out.price.push({h: el.outerHTML, t: el.innerText});
+});
+var walker = document.createTreeWalker(card, NodeFilter.SHOW_TEXT, null);
+var node;
+while ((node = walker.nextNode())) {
+    if (node.nodeValue.indexOf('¥') >= 0 && node.parentElement) {
+        out.yuan.push({h: node.parentElement.outerHTML, t: node.parentElement.innerText});
+    }
+}
+return out;
+"""
+
+# Количество iframe на странице и iframe капчи (src содержит punish) или null
+CAPTCHA_IFRAME_JS = """
+var frames = document.querySelectorAll('iframe');
+for (var i = 0; i < frames.length; i++) {
+    if ((frames[i].src || '').indexOf('punish') >= 0) return [frames.length, frames[i]];
+}
+return [frames.length, null];
+"""
+
+# Слайдер капчи, его видимость и ширина дорожки за один вызов: [slider или null, visible, width]
+CAPTCHA_SLIDER_JS = """
+var slider = document.querySelector(arguments[0]), track = document.querySelector(arguments[1]);
+var visible = !!slider && slider.getClientRects().length > 0 && window.getComputedStyle(slider).visibility !== 'hidden';
+return [slider, visible, track ? track.getBoundingClientRect().width : 0];
+"""
+
+# Асинхронное ожидание, пока элемент arguments[0] не исчезнет или не получит display: none.
+# MutationObserver завершает ожидание сразу после изменения DOM, arguments[1] - таймаут в мс
+WAIT_HIDDEN_JS = """
+var selector = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+function hidden() {
+    var el = document.querySelector(selector);
+    return !el || window.getComputedStyle(el).display === 'none';
+}
+if (hidden()) { done(true); return; }
+var timer;
+var observer = new MutationObserver(function() {
+    if (hidden()) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document.documentElement, {attributes: true, childList: true, subtree: true});
+timer = setTimeout(function() { observer.disconnect(); done(hidden()); }, timeoutMs);
+"""
+
+# Закрытие всплывающих окон за один вызов: окно блокировки (кнопки "Готово"/"Got"/"Управ"
+# и крестик), баннер _guide-use-hongbao, а также проверка видимости окна капчи
+POPUP_CHECK_JS = """
+function visible(el) {
+    return !!el && window.getComputedStyle(el).display !== 'none';
+}
+var result = {popup: false, captcha: false, banner: false};
+
+if (visible(document.querySelector('div[class*="MIDDLEWARE_FRAME"]'))) {
+    result.popup = true;
+    var closeText = /отово|Got|Управ/;
+    var buttons = document.querySelectorAll('button');
+    for (var i = 0; i < buttons.length; i++) {
+        if (closeText.test(buttons[i].textContent || '')) {
+            buttons[i].click();
+            break;
+        }
+    }
+    // Пробуем также нажать на любое изображение в окне (часто крестик)
+    var imgs = document.querySelectorAll('.J_MIDDLEWARE_FRAME_WIDGET img');
+    if (imgs.length > 0) imgs[0].click();
+}
+
+result.captcha = visible(document.querySelector('.J_MIDDLEWARE_FRAME_WIDGET'));
+
+var banner = document.querySelector('._guide-use-hongbao_sm0it_30');
+if (visible(banner)) {
+    var closeButton = banner.querySelector('._guide-use-close_sm0it_53');
+    if (closeButton) {
+        closeButton.click();
+        result.banner = true;
+    }
+}
+return result;
+"""
+
+# Данные для запасных способов поиска цены по индексам карточек arguments[1] (селектор arguments[0]):
+# candidates - тексты элементов внутри .mojar-element-price с price в классе или собственным текстом с ¥,
+# show_prices - тексты элементов showPrice/price-*, data_prices - значения data-price, text - текст карточки
+PRICE_FALLBACK_JS = """
+function ownTextHasYuan(el) {
+    return Array.prototype.some.call(el.childNodes, function(n) {
+        return n.nodeType === Node.TEXT_NODE && n.nodeValue.indexOf('¥') >= 0;
+    });
+}
+var cards = document.querySelectorAll(arguments[0]);
+return arguments[1].map(function(index) {
+    var card = cards[index];
+    if (!card) return null;
+    var out = {candidates: [], show_prices: [], data_prices: [], text: card.innerText || ''};
+    var container = card.querySelector('.mojar-element-price');
+    if (container) {
+        container.querySelectorAll('*').forEach(function(el) {
+            if (ownTextHasYuan(el) || (typeof el.className === 'string' && el.className.indexOf('price') >= 0)) {
+                out.candidates.push(el.innerText || '');
+            }
+        });
+    }
+    card.querySelectorAll('[class*="showPrice"], [class*="price-original"], [class*="price-discount"], [class*="price-current"]').forEach(function(el) {
+        out.show_prices.push(el.innerText || '');
+    });
+    card.querySelectorAll('[data-price]').forEach(function(el) {
+        out.data_prices.push(el.getAttribute('data-price'));
+    });
+    return out;
+});
+"""
+
+# Заголовок User-Agent для вспомогательных HTTP-запросов (скачивание изображений)
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session():
+    """
+    Общая HTTP-сессия с пулом соединений для всех экземпляров AlibabaProcessor.
+    requests импортируется при первом использовании.
+    
+    :return: Экземпляр requests.Session
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                session.headers.update({'User-Agent': HTTP_USER_AGENT})
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                atexit.register(session.close)
+                _http_session = session
+    return _http_session
+
 
 class AlibabaProcessor:
     """
@@ -36,6 +253,12 @@ class AlibabaProcessor:
         self.wait = WebDriverWait(driver, timeout)
         self.temp_folder = "temp"
         
+        # Ширина дорожки слайдера капчи, сохраняется между попытками
+        self._captcha_track_width = None
+        
+        # Один анализатор на процессор, чтобы не пересоздавать клиент OpenAI для каждого товара
+        self._ai_analyzer = AIAnalyzer()
+        
         # Создаем временную директорию, если её нет
         if not os.path.exists(self.temp_folder):
             os.makedirs(self.temp_folder)
@@ -68,14 +291,18 @@ class AlibabaProcessor:
         """
         try:
             if os.path.exists(self.temp_folder):
-                for file in os.listdir(self.temp_folder):
-                    file_path = os.path.join(self.temp_folder, file)
-                    try:
-                        if os.path.isfile(file_path):
-                            os.unlink(file_path)
-                            logger.debug(f"Удален временный файл: {file_path}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при удалении файла {file_path}: {e}")
+                removed_count = 0
+                # scandir отдает тип файла из readdir без дополнительного stat
+                with os.scandir(self.temp_folder) as entries:
+                    for entry in entries:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        try:
+                            os.unlink(entry.path)
+                            removed_count += 1
+                        except OSError as e:
+                            logger.error(f"Ошибка при удалении файла {entry.path}: {e}")
+                logger.debug(f"Удалено временных файлов: {removed_count}")
                 logger.info("Временная директория очищена")
         except Exception as e:
             logger.error(f"Ошибка при очистке временной директории: {e}")
@@ -103,10 +330,6 @@ class AlibabaProcessor:
         :return: Путь к сохраненному файлу
         """
         try:
-            # Создаем временную директорию, если её нет
-            if not os.path.exists(self.temp_folder):
-                os.makedirs(self.temp_folder)
-            
             # Генерируем уникальное имя файла
             timestamp = int(time.time())
             file_extension = os.path.splitext(image_url)[1]
@@ -115,15 +338,20 @@ class AlibabaProcessor:
             temp_filename = f"temp_image_{timestamp}{file_extension}"
             temp_path = os.path.join(self.temp_folder, temp_filename)
             
-            # Скачиваем изображение
-            response = requests.get(image_url, stream=True)
+            # Скачиваем изображение через общую сессию с пулом соединений
+            response = _get_http_session().get(image_url, stream=True)
             response.raise_for_status()
             
-            # Сохраняем файл
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Сохраняем файл, копируя поток напрямую на диск
+            response.raw.decode_content = True
+            try:
+                f = open(temp_path, 'wb')
+            except FileNotFoundError:
+                # Временную директорию удалили после инициализации - создаем заново
+                os.makedirs(self.temp_folder, exist_ok=True)
+                f = open(temp_path, 'wb')
+            with f:
+                shutil.copyfileobj(response.raw, f, length=65536)
             
             # Возвращаем абсолютный путь к файлу
             return os.path.abspath(temp_path)
@@ -139,16 +367,12 @@ class AlibabaProcessor:
         
         :param action_function: Функция для выполнения
         :param max_attempts: Максимальное количество попыток
-        :param wait_between: Время ожидания между попытками в секундах
+        :param wait_between: Базовое время ожидания между попытками в секундах
         :return: Результат функции или None в случае ошибки
         """
         for attempt in range(1, max_attempts + 1):
             try:
-                # Быстрая проверка всплывающих окон только перед первой попыткой
-                if attempt == 1:
-                    self._close_popup_windows()
-                
-                # Выполняем нужное действие
+                # Выполняем нужное действие (окна проверяются только после неудачи)
                 result = action_function()
                 
                 # Если успешно - возвращаем результат
@@ -162,8 +386,9 @@ class AlibabaProcessor:
                 if attempt == max_attempts:
                     return None
                 
-                # Иначе ждем и пробуем снова
-                time.sleep(wait_between)
+                # Иначе ждем с экспоненциальной задержкой и небольшим разбросом
+                backoff = min(5, wait_between * (1.7 ** (attempt - 1)))
+                time.sleep(backoff + random.uniform(0, 0.15))
         
         return None
 
@@ -173,79 +398,71 @@ class AlibabaProcessor:
         и доступ к загрузке изображений
         """
         try:
-            # Проверяем наличие модального окна о блокировке
-            blocked_popup_xpath = "//div[contains(text(), 'заблокированы') or contains(text(), 'blocked')]"
-            
             # Проверяем с коротким таймаутом наличие окна
             try:
                 popup_message = WebDriverWait(self.driver, 1).until(
-                    EC.presence_of_element_located((By.XPATH, blocked_popup_xpath))
+                    EC.presence_of_element_located(BLOCKED_POPUP_LOCATOR)
                 )
                 
                 logger.info("Обнаружено окно о блокировке всплывающих окон")
                 
-                # Находим все кнопки в окне
-                dialog_buttons = self.driver.find_elements(By.TAG_NAME, "button")
+                # Получаем тексты всех кнопок одним запросом вместо обращения к .text каждой кнопки
+                button_texts = self._get_button_texts()
                 
                 # Сначала пробуем найти кнопку "Управление"
                 manage_clicked = False
-                for button in dialog_buttons:
-                    if "правл" in button.text or "anage" in button.text or "настро" in button.text:
-                        logger.info("Нажимаем кнопку 'Управление'")
-                        try:
-                            button.click()
-                            manage_clicked = True
-                            time.sleep(1)
-                            break
-                        except:
-                            continue
+                manage_index = self._find_button_index(button_texts, MANAGE_BUTTON_NEEDLES)
+                if manage_index is not None:
+                    logger.info("Нажимаем кнопку 'Управление'")
+                    if self._click_button_by_index(manage_index):
+                        manage_clicked = True
+                        time.sleep(1)
                             
                 # Затем пробуем найти кнопку "Готово" или любую другую для закрытия
                 if manage_clicked:
                     # Получаем обновленный список кнопок после нажатия "Управление"
-                    buttons_after = self.driver.find_elements(By.TAG_NAME, "button")
-                    for button in buttons_after:
-                        if "отово" in button.text or "Gotit" in button.text or "ontinue" in button.text or "азре" in button.text:
-                            logger.info(f"Нажимаем на кнопку: {button.text}")
-                            try:
-                                button.click()
-                                time.sleep(0.5)
-                                break
-                            except:
-                                continue
+                    texts_after = self._get_button_texts()
+                    close_index = self._find_button_index(texts_after, CLOSE_BUTTON_NEEDLES)
+                    if close_index is not None:
+                        logger.info(f"Нажимаем на кнопку: {texts_after[close_index]}")
+                        if self._click_button_by_index(close_index):
+                            time.sleep(0.5)
                 
                 # Если не нашли кнопку управления, пробуем просто закрыть
                 if not manage_clicked:
                     logger.info("Пробуем просто закрыть окно блокировки")
                     # Пробуем найти любую кнопку закрытия
+                    dialog_buttons = self.driver.find_elements(*BUTTON_LOCATOR)
                     for button in dialog_buttons:
                         try:
                             button.click()
                             time.sleep(0.5)
                             logger.info("Нажали кнопку в окне блокировки")
                             break
-                        except:
+                        except WebDriverException:
                             continue
                 
                 # Проверяем, исчезло ли окно
                 try:
                     WebDriverWait(self.driver, 1).until_not(
-                        EC.presence_of_element_located((By.XPATH, blocked_popup_xpath))
+                        EC.presence_of_element_located(BLOCKED_POPUP_LOCATOR)
                     )
                     logger.info("Окно блокировки закрыто успешно")
-                except:
+                except TimeoutException:
                     logger.warning("Окно блокировки может все еще присутствовать")
                 
                 # Попробуем нажать на элементы страницы или клавиши Escape для закрытия
                 try:
                     ActionChains(self.driver).send_keys('\ue00c').perform()  # Escape
                     time.sleep(0.5)
-                except:
+                except WebDriverException:
                     pass
                 
-            except:
+            except TimeoutException:
                 # Окно блокировки не найдено
                 pass
+            except WebDriverException as e:
+                logger.debug(f"Ошибка при закрытии окна блокировки: {e}")
                 
             # Проверяем наличие настроек сайта в браузере через JavaScript
             try:
@@ -267,7 +484,7 @@ class AlibabaProcessor:
                 }
                 """
                 self.driver.execute_script(script)
-            except:
+            except WebDriverException:
                 pass
                 
             return True
@@ -276,6 +493,96 @@ class AlibabaProcessor:
             logger.warning(f"Ошибка при обработке настроек браузера: {e}")
             return False
 
+    def _evaluate_js(self, script: str, *args):
+        """
+        Выполнение JavaScript через CDP Runtime.evaluate с откатом на execute_script
+        
+        Скрипт пишется так же, как для execute_script: с return и arguments[i].
+        Аргументы должны сериализоваться в JSON (элементы WebDriver не поддерживаются).
+        Только для скриптов без побочных эффектов: при ошибке в CDP скрипт выполняется повторно.
+        
+        :param script: Тело JavaScript-функции
+        :param args: Аргументы, доступные в скрипте как arguments[i]
+        :return: Результат выполнения скрипта
+        """
+        expression = f"(function() {{ {script} }}).apply(null, {json.dumps(args, ensure_ascii=False)})"
+        try:
+            response = self.driver.execute_cdp_cmd("Runtime.evaluate", {
+                "expression": expression,
+                "returnByValue": True,
+                "awaitPromise": False
+            })
+            if "exceptionDetails" not in response:
+                return response.get("result", {}).get("value")
+            logger.debug(f"Ошибка выполнения скрипта через CDP: {response['exceptionDetails'].get('text')}")
+        except (WebDriverException, AttributeError) as e:
+            logger.debug(f"CDP недоступен, используем execute_script: {e}")
+        return self.driver.execute_script(script, *args)
+    
+    def _get_button_texts(self) -> list:
+        """
+        Получение текстов всех кнопок страницы за один запрос к браузеру
+        
+        :return: Список текстов кнопок в нижнем регистре
+        """
+        try:
+            texts = self._evaluate_js(
+                "return Array.from(document.querySelectorAll('button')).map(function(b) { return b.textContent || ''; });"
+            )
+            return [text.strip().lower() for text in texts or []]
+        except Exception as e:
+            logger.debug(f"Не удалось получить тексты кнопок: {e}")
+            return []
+    
+    @staticmethod
+    def _find_button_index(button_texts: list, needles: tuple):
+        """
+        Поиск индекса первой кнопки, текст которой содержит одну из подстрок
+        
+        :param button_texts: Список текстов кнопок в нижнем регистре
+        :param needles: Подстроки для поиска в нижнем регистре
+        :return: Индекс кнопки или None
+        """
+        for index, text in enumerate(button_texts):
+            if any(needle in text for needle in needles):
+                return index
+        return None
+    
+    def _click_button_by_index(self, index: int) -> bool:
+        """
+        Нажатие на кнопку по её индексу среди всех кнопок страницы
+        
+        :param index: Индекс кнопки
+        :return: True если кнопка нажата, False если нет
+        """
+        try:
+            return bool(self.driver.execute_script(
+                """
+                var button = document.querySelectorAll('button')[arguments[0]];
+                if (!button) return false;
+                button.click();
+                return true;
+                """,
+                index
+            ))
+        except Exception as e:
+            logger.debug(f"Не удалось нажать кнопку #{index}: {e}")
+            return False
+
+    def _find_upload_input(self, driver):
+        """
+        Условие ожидания для WebDriverWait: поле загрузки изображения.
+        Если поле еще не появилось, закрывает всплывающие окна перед следующим опросом.
+        
+        :param driver: WebDriver
+        :return: Элемент поля загрузки или False
+        """
+        try:
+            return driver.find_element(*UPLOAD_INPUT_LOCATOR)
+        except NoSuchElementException:
+            self._close_popup_windows()
+            return False
+    
     def search_by_image(self, image_path: str) -> bool:
         """
         Поиск товаров по изображению на 1688.com
@@ -293,7 +600,8 @@ class AlibabaProcessor:
             self.driver.get(search_page_url)
             
             # Однократная проверка на всплывающие окна после загрузки страницы
-            time.sleep(1)
+            # (вместо фиксированной паузы ждем готовности документа)
+            self._wait_for_document_ready(3)
             self._close_popup_windows()
             
             # Быстрая проверка на блокировку всплывающих окон
@@ -305,13 +613,13 @@ class AlibabaProcessor:
             for attempt in range(1, max_attempts + 1):
                 logger.info(f"Попытка загрузки изображения {attempt}/{max_attempts}...")
                 try:
-                    # Закрываем возможные окна перед каждой попыткой
-                    self._close_popup_windows()
-                    
-                    # Ищем кнопку загрузки
-                    upload_input = WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_element_located((By.ID, "img-search-upload"))
-                    )
+                    # Ищем кнопку загрузки; всплывающие окна закрываются внутри ожидания, пока её нет
+                    upload_input = WebDriverWait(
+                        self.driver,
+                        10 if attempt == 1 else 3,
+                        poll_frequency=0.5,
+                        ignored_exceptions=(StaleElementReferenceException,)
+                    ).until(self._find_upload_input)
                     
                     # Проверяем, видим ли элемент (иногда он скрыт)
                     if not upload_input.is_displayed():
@@ -319,46 +627,32 @@ class AlibabaProcessor:
                         self.driver.execute_script("arguments[0].style.display = 'block'; arguments[0].style.visibility = 'visible';", upload_input)
                         time.sleep(0.5)
                     
-                    # --- Добавляем логирование пути --- 
-                    logger.debug(f"Attempting send_keys with image path: {image_path}")
-                    # --- Конец логирования пути ---
-                    
                     # Загружаем файл
+                    logger.debug(f"Attempting send_keys with image path: {image_path}")
                     upload_input.send_keys(image_path)
                     logger.info("Изображение успешно отправлено в input.")
                     
-                    # --- Добавляем клик по кнопке поиска --- 
-                    try:
-                        logger.info("Попытка найти и нажать кнопку '搜索图片' (Search image)...")
-                        search_button = WebDriverWait(self.driver, 3).until(
-                            EC.element_to_be_clickable((By.CSS_SELECTOR, ".search-btn")) 
-                        )
-                        search_button.click()
-                        logger.info("Кнопка '搜索图片' успешно нажата.")
-                        upload_success = True # Подтверждаем успех всей операции загрузки + клика
-                        break # Выходим из цикла, если все успешно
-                    except TimeoutException:
-                        logger.warning("Кнопка '搜索图片' не найдена или не кликабельна после загрузки файла.")
-                        # Не выходим из цикла, даем шанс на следующей попытке send_keys
-                    except Exception as click_err:
-                        logger.error(f"Ошибка при клике на кнопку '搜索图片': {click_err}")
-                        # Не выходим из цикла
-                    # --- Конец клика по кнопке поиска ---
-                    
-                    # Если клик не удался, но send_keys прошел, возможно, автоматический поиск сработал
-                    # В этом случае мы все равно выйдем из цикла на следующей итерации, если upload_success = True
-                    # Но если клик был нужен, но не удался, мы продолжим цикл
-                    if upload_success:
-                         break # Выходим, если send_keys и клик (если он был нужен и найден) прошли успешно
+                    # Нажимаем кнопку поиска
+                    logger.info("Попытка найти и нажать кнопку '搜索图片' (Search image)...")
+                    search_button = WebDriverWait(self.driver, 3).until(
+                        EC.element_to_be_clickable(SEARCH_BUTTON_LOCATOR)
+                    )
+                    search_button.click()
+                    logger.info("Кнопка '搜索图片' успешно нажата.")
+                    upload_success = True
+                    break
                     
                 except TimeoutException:
-                    logger.warning(f"Кнопка загрузки не найдена на попытке {attempt}")
+                    logger.warning(f"Кнопка загрузки или поиска недоступна на попытке {attempt}")
+                except StaleElementReferenceException:
+                    logger.warning(f"Кнопка загрузки обновилась на странице во время попытки {attempt}")
                 except Exception as e:
                     logger.error(f"Ошибка при загрузке изображения на попытке {attempt}: {e}")
                 
                 # Если попытка не удалась и это не последняя попытка
-                if not upload_success and attempt < max_attempts:
+                if attempt < max_attempts:
                     logger.info(f"Ожидание перед следующей попыткой...")
+                    self._close_popup_windows()
                     time.sleep(2) # Пауза перед следующей попыткой
             
             # Если все попытки не увенчались успехом
@@ -370,7 +664,6 @@ class AlibabaProcessor:
             # Добавляем проверку окон сразу после загрузки изображения
             logger.info("Проверка всплывающих окон после загрузки изображения...")
             self._close_popup_windows()
-            time.sleep(1) # Небольшая пауза после проверки
             
             # Запоминаем текущий URL
             current_url = self.driver.current_url
@@ -378,6 +671,7 @@ class AlibabaProcessor:
             # Ждем результаты поиска с минимальным количеством проверок окон
             wait_time = 0
             max_wait_time = 60 # Увеличено время ожидания до 60 секунд
+            found_results_count = None # Количество карточек, если цикл завершился по ним
             
             while wait_time < max_wait_time:
                 # Проверяем всплывающие окна только каждые 10 секунд
@@ -399,21 +693,18 @@ class AlibabaProcessor:
                         self.driver.switch_to.window(search_results_window)
                         break
                 
-                # Проверяем изменение URL в текущей вкладке
+                # Проверяем изменение URL и наличие результатов одним запросом к браузеру
                 try:
-                    if self.driver.current_url != current_url and "1688.com" in self.driver.current_url:
+                    page_state = self._evaluate_js(SEARCH_STATE_JS, SEARCH_RESULTS_CSS) or {}
+                    page_url = page_state.get('url') or ''
+                    if page_url != current_url and "1688.com" in page_url:
                         logger.info(f"URL изменился в текущей вкладке после {wait_time} секунд ожидания")
                         break
-                except:
-                    pass
-                
-                # Проверяем наличие результатов поиска на странице
-                try:
-                    search_results = self.driver.find_elements(By.CSS_SELECTOR, ".space-offer-card-box, .space-offer-card, .sm-offer-item, .offer-item, .card-container")
-                    if search_results and len(search_results) > 0:
+                    if page_state.get('results', 0) > 0:
+                        found_results_count = page_state['results']
                         logger.info(f"Обнаружены результаты поиска в текущей вкладке после {wait_time} секунд ожидания")
                         break
-                except:
+                except WebDriverException:
                     pass
                 
                 time.sleep(1)
@@ -426,10 +717,11 @@ class AlibabaProcessor:
                     lambda driver: driver.execute_script("return document.readyState") == "complete"
                 )
                 
-                # Проверяем наличие результатов поиска
-                search_results = self.driver.find_elements(By.CSS_SELECTOR, ".space-offer-card-box, .space-offer-card, .sm-offer-item, .offer-item, .card-container, .normalcommon-offer-card")
-                if search_results and len(search_results) > 0:
-                    logger.info(f"Найдено {len(search_results)} результатов поиска")
+                # Проверяем наличие результатов поиска (повторно ищем, только если цикл завершился не по ним)
+                if found_results_count is None:
+                    found_results_count = len(self.driver.find_elements(*SEARCH_RESULTS_LOCATOR))
+                if found_results_count > 0:
+                    logger.info(f"Найдено {found_results_count} результатов поиска")
                     
                     # Закрываем возможные окна перед обработкой результатов
                     self._close_popup_windows()
@@ -476,8 +768,8 @@ class AlibabaProcessor:
                 logger.error("Не удалось скачать изображение")
                 return None
             
-            # Создаем анализатор
-            ai_analyzer = AIAnalyzer()
+            # Используем общий анализатор
+            ai_analyzer = self._ai_analyzer
             
             try:
                 # Выполняем поиск на 1688.com
@@ -562,16 +854,18 @@ class AlibabaProcessor:
                 lambda driver: driver.execute_script("return document.readyState") == "complete"
             )
             
-            # Даем дополнительное время для загрузки динамического контента
-            time.sleep(2)
-            
-            # Проверяем наличие результатов поиска
+            # Ждем появления динамически подгружаемых карточек не дольше 3 секунд
             try:
-                search_results = self.driver.find_elements(By.CSS_SELECTOR, ".space-offer-card-box, .space-offer-card, .sm-offer-item, .offer-item, .card-container")
+                WebDriverWait(self.driver, 3, poll_frequency=0.1).until(
+                    EC.presence_of_element_located(SEARCH_RESULTS_LOCATOR)
+                )
+                search_results = self.driver.find_elements(*SEARCH_RESULTS_LOCATOR)
                 if search_results:
                     logger.info(f"Найдено {len(search_results)} результатов поиска")
                     return True
-            except:
+            except TimeoutException:
+                logger.debug("Карточки результатов не появились за отведенное время")
+            except WebDriverException:
                 pass
             
             logger.warning("Не удалось найти результаты поиска на странице")
@@ -590,171 +884,31 @@ class AlibabaProcessor:
         try:
             # Ждем появления карточек товаров
             WebDriverWait(self.driver, 30).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "normalcommon-offer-card"))
+                EC.presence_of_element_located(PRODUCT_CARD_LOCATOR)
             )
             
-            # Получаем все карточки товаров
-            product_cards = self.driver.find_elements(By.CLASS_NAME, "normalcommon-offer-card")
-            
-            # Ограничиваем количество карточек до 15
-            product_cards = product_cards[:15]
-            logger.info(f"Ограничиваем количество товаров до {len(product_cards)}")
+            # Базовые поля первых 15 карточек получаем одним запросом к браузеру
+            # (карточки ищутся внутри скрипта, элементы WebDriver не запрашиваются)
+            cards_fields = self._extract_cards_fields(MAX_PRODUCT_CARDS, CARD_FIELDS_SPEC)
+            logger.info(f"Ограничиваем количество товаров до {len(cards_fields)}")
             
             processed_products = []
             
-            for card in product_cards:
+            # Данные для запасных способов поиска цены - одним запросом для всех карточек без цены
+            missing_price = [i for i, fields in enumerate(cards_fields) if fields.get('price') is None]
+            fallbacks = self._collect_price_fallbacks(missing_price)
+            fallback_by_index = dict(zip(missing_price, fallbacks))
+            
+            for index, fields in enumerate(cards_fields):
                 try:
-                    # Базовые данные о товаре, которые мы всегда получаем
-                    product_data = {
-                        'title': self._get_text_or_default(card, ".mojar-element-title .title", "Без названия"),
-                        'url': self._get_attribute_or_default(card, ".mojar-element-title a", "href", "#"),
-                        'company_name': self._get_text_or_default(card, ".mojar-element-company .company-name", "Неизвестно"),
-                        'sales': self._get_text_or_default(card, ".mojar-element-price .count", "Нет данных"),
-                        'shop_years': self._get_text_or_default(card, ".credit-tag", "Нет данных"),
-                        'repurchase_rate': self._get_text_or_default(card, ".shop-repurchase-rate", "Нет данных")
-                    }
-                    
-                    # Обработка URL изображения
-                    try:
-                        img_style = card.find_element(By.CSS_SELECTOR, ".img").get_attribute('style')
-                        if 'url(' in img_style:
-                            img_url = img_style.split('url("')[1].split('")')[0]
-                            product_data['image_url'] = img_url
-                        else:
-                            product_data['image_url'] = ""
-                    except:
-                        product_data['image_url'] = ""
-                    
-                    # Разные способы получения цены - поддержка разных версий разметки
-                    price = "0"
-                    price_found = False
-                    
-                    # Способ 1: Стандартный .mojar-element-price .price
-                    try:
-                        price_element = card.find_element(By.CSS_SELECTOR, ".mojar-element-price .price")
-                        if price_element:
-                            price = price_element.text.strip()
-                            price_found = True
-                            logger.debug(f"Нашли цену способом 1: {price}")
-                    except:
-                        pass
-                    
-                    # Способ 2: Через JavaScript (более надежный)
-                    if not price_found:
-                        try:
-                            # Получить элемент через JS и извлечь текст
-                            price = self.driver.execute_script("""
-                                var card = arguments[0];
-                                var priceDiv = card.querySelector('.mojar-element-price .price');
-                                return priceDiv ? priceDiv.textContent.trim() : '0';
-                            """, card)
-                            
-                            if price and price != '0':
-                                price_found = True
-                                logger.debug(f"Нашли цену способом 2: {price}")
-                        except:
-                            pass
-                    
-                    # Способ 3: Попытка найти в дочерних элементах
-                    if not price_found:
-                        try:
-                            price_container = card.find_element(By.CSS_SELECTOR, ".mojar-element-price")
-                            # Ищем все возможные элементы с числами
-                            price_candidates = price_container.find_elements(By.XPATH, ".//*[contains(text(), '¥') or contains(@class, 'price')]")
-                            
-                            for candidate in price_candidates:
-                                candidate_text = candidate.text.strip()
-                                # Проверяем, содержит ли текст цифры
-                                if any(c.isdigit() for c in candidate_text):
-                                    # Извлекаем только цифры и точки
-                                    price = ''.join(c for c in candidate_text if c.isdigit() or c == '.')
-                                    price_found = True
-                                    logger.debug(f"Нашли цену способом 3: {price} из {candidate_text}")
-                                    break
-                        except:
-                            pass
-                    
-                    # Способ 3.5: Поиск по showPrice (часто встречается на 1688)
-                    if not price_found:
-                        try:
-                            # Ищем элементы с классом showPrice
-                            show_price_elements = card.find_elements(By.XPATH, ".//*[contains(@class, 'showPrice') or contains(@class, 'price-original') or contains(@class, 'price-discount') or contains(@class, 'price-current')]")
-                            for show_price in show_price_elements:
-                                price_text = show_price.text.strip()
-                                if price_text and any(c.isdigit() for c in price_text):
-                                    # Извлекаем только цифры и точки
-                                    price_digits = ''.join(c for c in price_text if c.isdigit() or c == '.')
-                                    if price_digits:
-                                        price = price_digits
-                                        price_found = True
-                                        logger.debug(f"Нашли цену способом 3.5 (showPrice): {price} из {price_text}")
-                                        break
-                        except Exception as e:
-                            logger.debug(f"Ошибка при поиске showPrice: {e}")
-                    
-                    # Способ 4: Попытка найти в атрибутах data
-                    if not price_found:
-                        try:
-                            # Ищем элемент с атрибутом data-price или data-spm
-                            price_data_elements = card.find_elements(By.XPATH, ".//*[@data-price or @data-spm]")
-                            for element in price_data_elements:
-                                price_data = element.get_attribute('data-price')
-                                if price_data:
-                                    price = price_data
-                                    price_found = True
-                                    logger.debug(f"Нашли цену способом 4: {price}")
-                                    break
-                        except:
-                            pass
-                    
-                    # Последний способ: ищем в тексте всего элемента карточки
-                    if not price_found:
-                        try:
-                            card_text = card.text
-                            # Ищем шаблон ¥ с числами после него
-                            import re
-                            price_matches = re.findall(r'¥\s*(\d+(?:\.\d+)?)', card_text)
-                            if price_matches:
-                                price = price_matches[0]
-                                price_found = True
-                                logger.debug(f"Нашли цену способом 5: {price}")
-                        except:
-                            pass
-                    
-                    # Сохраняем найденную цену
-                    product_data['price'] = price
+                    product_data, price_found = self._build_product_data(fields, fallback_by_index.get(index))
                     
                     # Логируем если цена не найдена
-                    if not price_found or price == "0":
+                    if not price_found or product_data['price'] == "0":
                         logger.warning(f"Не удалось найти цену для товара: {product_data['title']}")
-                        # Сохраняем HTML карточки для диагностики
-                        try:
-                            card_html = card.get_attribute('outerHTML')
-                            logger.debug(f"HTML карточки товара с нулевой ценой: {card_html}")
-                            
-                            # Пытаемся найти все элементы с классом, содержащим price
-                            price_elements = card.find_elements(By.XPATH, ".//*[contains(@class, 'price')]")
-                            if price_elements:
-                                for i, el in enumerate(price_elements):
-                                    try:
-                                        el_html = el.get_attribute('outerHTML')
-                                        el_text = el.text
-                                        logger.debug(f"Price element #{i}: HTML={el_html}, Text={el_text}")
-                                    except:
-                                        pass
-                            
-                            # Ищем элементы, содержащие символ юаня ¥
-                            yuan_elements = card.find_elements(By.XPATH, ".//*[contains(text(), '¥')]")
-                            if yuan_elements:
-                                for i, el in enumerate(yuan_elements):
-                                    try:
-                                        el_html = el.get_attribute('outerHTML')
-                                        el_text = el.text
-                                        logger.debug(f"Yuan element #{i}: HTML={el_html}, Text={el_text}")
-                                    except:
-                                        pass
-                        except Exception as html_err:
-                            logger.warning(f"Не удалось получить HTML карточки: {html_err}")
+                        # HTML карточки собирается только если отладочные сообщения попадут в лог
+                        if is_debug_enabled():
+                            self._log_price_debug(index)
                     
                     processed_products.append(product_data)
                     
@@ -768,41 +922,165 @@ class AlibabaProcessor:
             logger.error(f"Ошибка при обработке карточек товаров: {e}")
             return []
             
-    def _get_text_or_default(self, element, selector, default=""):
+    @classmethod
+    def _build_product_data(cls, fields: dict, fallback: dict = None) -> tuple:
         """
-        Безопасное получение текста элемента
+        Формирование данных товара из полей карточки без обращений к браузеру
         
-        :param element: Родительский элемент
-        :param selector: CSS селектор
-        :param default: Значение по умолчанию
-        :return: Текст элемента или значение по умолчанию
+        :param fields: Поля карточки из _extract_cards_fields
+        :param fallback: Данные запасных способов поиска цены из _collect_price_fallbacks или None
+        :return: Кортеж (словарь с данными товара, найдена ли цена)
+        """
+        # Базовые данные о товаре, которые мы всегда получаем
+        product_data = {
+            'title': cls._field_or_default(fields.get('title'), "Без названия"),
+            'url': fields.get('url') or "#",
+            'company_name': cls._field_or_default(fields.get('company_name'), "Неизвестно"),
+            'sales': cls._field_or_default(fields.get('sales'), "Нет данных"),
+            'shop_years': cls._field_or_default(fields.get('shop_years'), "Нет данных"),
+            'repurchase_rate': cls._field_or_default(fields.get('repurchase_rate'), "Нет данных")
+        }
+        
+        # Обработка URL изображения
+        try:
+            img_style = fields.get('image_style') or ""
+            if 'url(' in img_style:
+                product_data['image_url'] = img_style.split('url("')[1].split('")')[0]
+            else:
+                product_data['image_url'] = ""
+        except IndexError:
+            product_data['image_url'] = ""
+        
+        # Разные способы получения цены - поддержка разных версий разметки
+        price = "0"
+        price_found = False
+        
+        # Способ 1: Стандартный .mojar-element-price .price
+        if fields.get('price') is not None:
+            price = fields['price']
+            price_found = True
+            logger.debug(f"Нашли цену способом 1: {price}")
+        
+        # Запасные способы: данные карточки уже получены одним общим запросом
+        if not price_found and fallback:
+            fallback_price = cls._price_from_fallback(fallback)
+            if fallback_price is not None:
+                price = fallback_price
+                price_found = True
+        
+        product_data['price'] = price
+        return product_data, price_found
+    
+    def _log_price_debug(self, index: int):
+        """
+        Логирование HTML карточки без цены для диагностики (все данные одним запросом к браузеру)
+        
+        :param index: Индекс карточки товара на странице
         """
         try:
-            elements = element.find_elements(By.CSS_SELECTOR, selector)
-            if elements and len(elements) > 0:
-                return elements[0].text.strip()
-            return default
-        except:
-            return default
+            debug_info = self._collect_price_debug(index)
+            logger.debug(f"HTML карточки товара с нулевой ценой: {debug_info.get('html')}")
+            
+            # Элементы с классом, содержащим price
+            for i, el in enumerate(debug_info.get('price') or []):
+                logger.debug(f"Price element #{i}: HTML={el.get('h')}, Text={el.get('t')}")
             
-    def _get_attribute_or_default(self, element, selector, attribute, default=""):
+            # Элементы, содержащие символ юаня ¥
+            for i, el in enumerate(debug_info.get('yuan') or []):
+                logger.debug(f"Yuan element #{i}: HTML={el.get('h')}, Text={el.get('t')}")
+        except Exception as html_err:
+            logger.warning(f"Не удалось получить HTML карточки: {html_err}")
+    
+    def _extract_cards_fields(self, limit: int, spec: dict) -> list:
         """
-        Безопасное получение атрибута элемента
+        Получение полей первых карточек товаров за один вызов скрипта через CDP
         
-        :param element: Родительский элемент
-        :param selector: CSS селектор
-        :param attribute: Имя атрибута
-        :param default: Значение по умолчанию
-        :return: Значение атрибута или значение по умолчанию
+        :param limit: Максимальное количество карточек
+        :param spec: Словарь {поле: (CSS селектор, 'text' или имя атрибута)}
+        :return: Список словарей {поле: значение или None, если элемент не найден}
         """
         try:
-            elements = element.find_elements(By.CSS_SELECTOR, selector)
-            if elements and len(elements) > 0:
-                value = elements[0].get_attribute(attribute)
-                return value if value else default
-            return default
-        except:
-            return default
+            return self._evaluate_js(CARDS_FIELDS_JS, PRODUCT_CARD_CSS, limit, spec) or []
+        except Exception as e:
+            logger.debug(f"Не удалось получить поля карточек: {e}")
+        
+        # Если скрипт не вернул данные, карточки обрабатываются только запасными способами
+        count = len(self.driver.find_elements(*PRODUCT_CARD_LOCATOR))
+        return [{} for _ in range(min(count, limit))]
+    
+    def _collect_price_fallbacks(self, indices: list) -> list:
+        """
+        Получение данных для запасных способов поиска цены за один вызов скрипта через CDP
+        
+        :param indices: Индексы карточек без основной цены
+        :return: Список словарей с данными по каждой карточке (пустой при ошибке)
+        """
+        if not indices:
+            return []
+        try:
+            return self._evaluate_js(PRICE_FALLBACK_JS, PRODUCT_CARD_CSS, indices) or []
+        except Exception as e:
+            logger.debug(f"Не удалось получить данные для поиска цены: {e}")
+            return []
+    
+    @staticmethod
+    def _price_from_fallback(fallback: dict):
+        """
+        Поиск цены в данных запасных способов в порядке их приоритета
+        
+        :param fallback: Словарь из _collect_price_fallbacks
+        :return: Строка с ценой или None
+        """
+        # Способ 3: элементы внутри блока цены
+        for candidate_text in fallback.get('candidates') or []:
+            match = PRICE_NUMBER_RE.search(candidate_text)
+            if match:
+                price = match.group(0).replace(',', '')
+                logger.debug(f"Нашли цену способом 3: {price} из {candidate_text.strip()}")
+                return price
+        
+        # Способ 3.5: showPrice (часто встречается на 1688)
+        for price_text in fallback.get('show_prices') or []:
+            match = PRICE_NUMBER_RE.search(price_text)
+            if match:
+                price = match.group(0).replace(',', '')
+                logger.debug(f"Нашли цену способом 3.5 (showPrice): {price} из {price_text.strip()}")
+                return price
+        
+        # Способ 4: атрибут data-price
+        for price_data in fallback.get('data_prices') or []:
+            if price_data:
+                logger.debug(f"Нашли цену способом 4: {price_data}")
+                return price_data
+        
+        # Последний способ: шаблон ¥ с числами в тексте всей карточки
+        match = YUAN_PRICE_RE.search(fallback.get('text') or '')
+        if match:
+            price = match.group(1).replace(',', '')
+            logger.debug(f"Нашли цену способом 5: {price}")
+            return price
+        
+        return None
+    
+    @staticmethod
+    def _field_or_default(value, default):
+        """
+        Значение текстового поля или значение по умолчанию, если элемент не найден
+        
+        :param value: Значение из _extract_card_fields
+        :param default: Значение по умолчанию
+        :return: Значение поля или значение по умолчанию
+        """
+        return default if value is None else value
+    
+    def _collect_price_debug(self, index: int) -> dict:
+        """
+        Сбор диагностической информации о цене карточки за один вызов скрипта через CDP
+        
+        :param index: Индекс карточки товара на странице
+        :return: Словарь {'html': str, 'price': [{'h', 't'}], 'yuan': [{'h', 't'}]}
+        """
+        return self._evaluate_js(PRICE_DEBUG_JS, PRODUCT_CARD_CSS, index) or {}
     
     def _close_popup_windows(self):
         """
@@ -810,78 +1088,56 @@ class AlibabaProcessor:
         Оптимизирован для сверхбыстрого выполнения
         """
         try:
-            # Экспресс-проверка наличия всплывающего окна блокировки
-            try:
-                # Максимально быстрая проверка, пропускаем find_element для скорости
-                popup = self.driver.execute_script(
-                    """
-                    var popup = document.querySelector('div[class*="MIDDLEWARE_FRAME"]');
-                    return popup && window.getComputedStyle(popup).display !== 'none';
-                    """
-                )
-                
-                if popup:
-                    # Закрываем окно через JavaScript для максимальной скорости
-                    self.driver.execute_script(
-                        """
-                        // Находим кнопки закрытия и нажимаем без лишних проверок
-                        var buttons = document.querySelectorAll('button');
-                        for(var i=0; i<buttons.length; i++) {
-                            if(buttons[i].innerText.includes('отово') || 
-                               buttons[i].innerText.includes('Got') ||
-                               buttons[i].innerText.includes('Управ')) {
-                                buttons[i].click();
-                                break;
-                            }
-                        }
-                        
-                        // Пробуем также нажать на любое изображение в окне (часто крестик)
-                        var imgs = document.querySelectorAll('.J_MIDDLEWARE_FRAME_WIDGET img');
-                        if(imgs.length > 0) imgs[0].click();
-                        """
-                    )
-                    # Минимальная пауза для применения изменений
-                    time.sleep(0.1)
-            except:
-                pass
-                
-            # Проверяем наличие окна проверки человека (капчи) - минимальная версия
-            captcha_container = self.driver.execute_script(
-                """
-                var captcha = document.querySelector('.J_MIDDLEWARE_FRAME_WIDGET');
-                return captcha && window.getComputedStyle(captcha).display !== 'none';
-                """
-            )
+            # Проверка и закрытие окна блокировки, проверка капчи и закрытие баннера - одним скриптом.
+            # Скрипт нажимает кнопки, поэтому не через _evaluate_js: при его откате клики выполнились бы дважды
+            state = self.driver.execute_script(POPUP_CHECK_JS) or {}
             
-            if captcha_container:
+            if state.get('popup'):
+                # Ждем закрытия окна не дольше прежней паузы
+                self._wait_until_hidden('div[class*="MIDDLEWARE_FRAME"]', 0.1)
+            
+            if state.get('banner'):
+                logger.info("Закрыт баннер _guide-use-hongbao")
+                self._wait_until_hidden('._guide-use-hongbao_sm0it_30', 0.2)
+            
+            if state.get('captcha'):
                 self._handle_captcha()
-                
-            # Добавляем проверку и закрытие баннера _guide-use-hongbao
-            try:
-                banner_closed = self.driver.execute_script(
-                    """
-                    var banner = document.querySelector('._guide-use-hongbao_sm0it_30');
-                    if (banner && window.getComputedStyle(banner).display !== 'none') {
-                        var closeButton = banner.querySelector('._guide-use-close_sm0it_53');
-                        if (closeButton) {
-                            closeButton.click();
-                            return true; // Баннер был найден и закрыт
-                        }
-                    }
-                    return false; // Баннер не найден или не был закрыт
-                    """
-                )
-                if banner_closed:
-                    logger.info("Закрыт баннер _guide-use-hongbao")
-                    time.sleep(0.2) # Небольшая пауза после закрытия
-            except Exception as banner_err:
-                logger.warning(f"Ошибка при попытке закрыть баннер _guide-use-hongbao: {banner_err}")
             
             return True
         except Exception as e:
             logger.warning(f"Ошибка при закрытии всплывающих окон: {e}")
             return False
             
+    def _wait_until_hidden(self, css_selector: str, timeout: float) -> bool:
+        """
+        Ожидание, пока элемент не исчезнет или не будет скрыт (display: none)
+        
+        :param css_selector: CSS селектор элемента
+        :param timeout: Максимальное время ожидания в секундах
+        :return: True если элемент скрыт, False если истек таймаут
+        """
+        try:
+            # Ожидание выполняется в браузере одним запросом, без опроса из Python
+            return bool(self.driver.execute_async_script(WAIT_HIDDEN_JS, css_selector, int(timeout * 1000)))
+        except WebDriverException as e:
+            logger.debug(f"Ошибка при ожидании скрытия элемента {css_selector}: {e}")
+            return False
+    
+    def _wait_for_document_ready(self, timeout: float) -> bool:
+        """
+        Ожидание полной загрузки документа (после перехода или перезагрузки страницы)
+        
+        :param timeout: Максимальное время ожидания в секундах
+        :return: True если документ загружен, False если истек таймаут
+        """
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+            return True
+        except TimeoutException:
+            return False
+    
     def _handle_captcha(self):
         """
         Обрабатывает окно проверки человека (капчи) на 1688.com
@@ -892,43 +1148,32 @@ class AlibabaProcessor:
             
             # Проверяем наличие элемента J_MIDDLEWARE_FRAME_WIDGET
             try:
-                captcha_container = self.driver.find_element(By.CLASS_NAME, "J_MIDDLEWARE_FRAME_WIDGET")
+                captcha_container = self.driver.find_element(*CAPTCHA_CONTAINER_LOCATOR)
                 if captcha_container and captcha_container.is_displayed():
                     logger.warning("Обнаружено окно проверки человека (капча)")
                     
-                    # Получаем все iframe на странице
-                    iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
+                    # Ищем iframe капчи (src содержит punish) одним запросом к браузеру
+                    iframes_count, captcha_frame = self.driver.execute_script(CAPTCHA_IFRAME_JS)
                     
-                    if iframes:
-                        # Перебираем все iframe и пытаемся найти тот, который связан с капчей
-                        for iframe in iframes:
-                            src = iframe.get_attribute("src")
-                            if src and "punish" in src:
-                                captcha_frame = iframe
-                                break
-                        
+                    if iframes_count:
                         if captcha_frame:
                             logger.info("Найден iframe с капчей, пытаемся решить")
                             
                             # Переключаемся на frame капчи
                             self.driver.switch_to.frame(captcha_frame)
                             
-                            # Ищем различные типы элементов капчи
-                            slider = self.driver.find_element(By.CSS_SELECTOR, ".nc_iconfont.btn_slide")
+                            # Слайдер, его видимость и ширину дорожки получаем одним запросом
+                            slider, slider_visible, track_width = self.driver.execute_script(
+                                CAPTCHA_SLIDER_JS, CAPTCHA_SLIDER_CSS, CAPTCHA_TRACK_CSS
+                            )
+                            if track_width:
+                                self._captcha_track_width = track_width
+                            else:
+                                track_width = self._captcha_track_width
                             
-                            if slider and slider.is_displayed():
+                            if slider and slider_visible and track_width:
                                 logger.info("Найден слайдер капчи, выполняем естественное перетаскивание")
                                 
-                                # Получаем размер элемента и слайдера
-                                track_element = self.driver.find_element(By.CSS_SELECTOR, ".nc-lang-cnt")
-                                track_width = track_element.size['width']
-                                
-                                # Создаем цепочку действий
-                                action = ActionChains(self.driver)
-                                
-                                # Нажимаем и удерживаем слайдер
-                                action.click_and_hold(slider).perform()
-                                
                                 # Определяем минимальное количество шагов
                                 num_steps = random.randint(5, 8)  # Минимальное количество шагов для высокой скорости
                                 
@@ -936,6 +1181,11 @@ class AlibabaProcessor:
                                 total_duration = random.uniform(0.05, 0.08)  # Сверхкороткое время на весь процесс
                                 step_time = total_duration / num_steps  # Время на один шаг (минимальное)
                                 
+                                # Собираем все перетаскивание в одну цепочку действий: паузы между шагами
+                                # выполняет сам браузер, а команда отправляется одним запросом
+                                action = ActionChains(self.driver)
+                                action.click_and_hold(slider)
+                                
                                 # Начальное положение
                                 current_x = 0
                                 
@@ -951,46 +1201,41 @@ class AlibabaProcessor:
                                     move_size = target_x - current_x
                                     
                                     # Перемещаем слайдер на следующую позицию без вариаций
-                                    action.move_by_offset(move_size, 0).perform()
+                                    action.move_by_offset(move_size, 0)
                                     current_x += move_size
                                     
                                     # Минимальная микро-пауза
                                     if i < num_steps - 1:  # Пропускаем паузу на последнем шаге
-                                        time.sleep(step_time)
+                                        action.pause(step_time)
                                 
                                 # Отпускаем слайдер без задержки
-                                action.release().perform()
-                                
-                                # Ждем успешной верификации - минимальное время
-                                time.sleep(0.5)
+                                action.release()
+                                action.perform()
                             else:
-                                logger.warning("Слайдер капчи найден, но не отображается")
+                                logger.warning("Слайдер капчи не найден или не отображается")
                             
                             # Возвращаемся к основному содержимому страницы
                             self.driver.switch_to.default_content()
                             
-                            # Проверяем, исчезла ли капча - с минимальным временем ожидания
+                            # Проверяем, исчезла ли капча - ждем верификации не дольше 1 секунды
                             try:
-                                time.sleep(0.5)  # Сокращаем время ожидания до минимума
-                                
-                                # Проверяем, все еще видна ли капча
-                                if captcha_container.is_displayed():
+                                if not self._wait_until_hidden('.J_MIDDLEWARE_FRAME_WIDGET', 1.0):
                                     logger.warning("Капча все еще отображается")
                                     
                                     # Пробуем нажать на крестик для закрытия окна капчи
                                     try:
-                                        close_button = self.driver.find_element(By.CSS_SELECTOR, ".J_MIDDLEWARE_FRAME_WIDGET img")
+                                        close_button = self.driver.find_element(*CAPTCHA_CLOSE_LOCATOR)
                                         if close_button and close_button.is_displayed():
                                             close_button.click()
                                             logger.info("Нажата кнопка закрытия окна капчи")
-                                            time.sleep(0.2)  # Минимальное ожидание
+                                            self._wait_until_hidden('.J_MIDDLEWARE_FRAME_WIDGET', 0.2)
                                     except Exception as e:
                                         logger.warning(f"Ошибка при закрытии окна капчи: {e}")
                                     
                                     # Перезагрузка страницы как последнее средство
                                     logger.info("Перезагружаем страницу для обхода капчи")
                                     self.driver.refresh()
-                                    time.sleep(2)  # Сокращаем время ожидания после перезагрузки
+                                    self._wait_for_document_ready(2)
                                 else:
                                     logger.info("Капча успешно пройдена")
                             except Exception as e:
@@ -1000,12 +1245,12 @@ class AlibabaProcessor:
                         
                         # Пробуем нажать на крестик для закрытия окна
                         try:
-                            close_button = captcha_container.find_element(By.TAG_NAME, "img")
+                            close_button = captcha_container.find_element(*IMG_LOCATOR)
                             if close_button:
                                 close_button.click()
                                 logger.info("Нажата кнопка закрытия окна проверки")
-                                time.sleep(1)
-                        except:
+                                self._wait_until_hidden('.J_MIDDLEWARE_FRAME_WIDGET', 1.0)
+                        except WebDriverException:
                             pass
             except NoSuchElementException:
                 # Элемент капчи не найден, ничего не делаем
@@ -1019,8 +1264,8 @@ class AlibabaProcessor:
             try:
                 logger.info("Перезагружаем страницу после ошибки обработки капчи")
                 self.driver.refresh()
-                time.sleep(5)
-            except:
+                self._wait_for_document_ready(5)
+            except WebDriverException:
                 pass
                 
-            return False
\ No newline at end of file
+            return False
@@ -1,39 +1,314 @@
 import time
 import re
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+import random
+import threading
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+import requests
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import undetected_chromedriver as uc
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from src.core.browser_pool import browser_pool
 from src.utils.logger import logger
 
+# Сторонние домены аналитики и рекламы, не нужные для разбора страниц.
+# CDN с данными товаров (alicdn, ozone.ru) не блокируются
+BLOCKED_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*mc.yandex.ru*",
+    "*mmstat.com*",
+]
+
+# Максимальное количество вкладок, открытых через acquire_tab в одном браузере
+MAX_TABS_PER_INSTANCE = 8
+
+# Прокрутка к элементу с отступом под шапку сайта за один вызов.
+# arguments[0] - ID элемента, arguments[1] - CSS-селектор; возвращает true, если элемент найден
+SCROLL_TO_ELEMENT_JS = """
+var el = arguments[0] ? document.getElementById(arguments[0]) : document.querySelector(arguments[1]);
+if (!el) return false;
+el.scrollIntoView(true);
+window.scrollBy(0, -120);
+return true;
+"""
+
+@lru_cache(maxsize=1024)
+def _resolve_redirect(url):
+    """
+    Получение конечного URL сокращенной ссылки HTTP-запросом без браузера.
+    Результаты кэшируются, ошибки не кэшируются.
+    
+    :param url: Сокращенная ссылка
+    :return: Конечный URL после всех перенаправлений
+    """
+    headers = {"User-Agent": "Mozilla/5.0"}
+    response = requests.head(url, allow_redirects=True, timeout=5, headers=headers)
+    if response.status_code >= 400:
+        # Некоторые сервисы сокращения ссылок не поддерживают HEAD - повторяем через GET без загрузки тела
+        with requests.get(url, allow_redirects=True, timeout=5, headers=headers, stream=True) as response:
+            return response.url
+    return response.url
+
+# Смещение области содержимого iframe arguments[0] относительно окна: [x, y]
+FRAME_OFFSET_JS = """
+var frame = arguments[0], rect = frame.getBoundingClientRect();
+return [rect.left + frame.clientLeft, rect.top + frame.clientTop];
+"""
+
+# Центр элемента arguments[0] в координатах его документа: [x, y]
+ELEMENT_CENTER_JS = """
+var rect = arguments[0].getBoundingClientRect();
+return [rect.left + rect.width / 2, rect.top + rect.height / 2];
+"""
+
+# Первый элемент по селектору arguments[0], если он отображается, иначе null
+# (аналог find_element + is_displayed за один вызов).
+# offsetParent не подходит: у элементов с position: fixed он всегда null
+FIND_VISIBLE_JS = """
+var el = document.querySelector(arguments[0]);
+return el && el.getClientRects().length > 0 && window.getComputedStyle(el).visibility !== 'hidden' ? el : null;
+"""
+
+# iframe капчи (src содержит punish) или null
+PUNISH_IFRAME_JS = """
+var frames = document.querySelectorAll('iframe');
+for (var i = 0; i < frames.length; i++) {
+    if ((frames[i].src || '').indexOf('punish') >= 0) return frames[i];
+}
+return null;
+"""
+
+# Нажатие на первую видимую кнопку документа; возвращает true, если кнопка найдена
+CLICK_VISIBLE_BUTTON_JS = """
+var buttons = document.querySelectorAll('button');
+for (var i = 0; i < buttons.length; i++) {
+    if (buttons[i].getClientRects().length > 0 && window.getComputedStyle(buttons[i]).visibility !== 'hidden') {
+        buttons[i].click();
+        return true;
+    }
+}
+return false;
+"""
+
+# Скрипт разрешения всплывающих окон и уведомлений, выполняемый в каждом новом документе
+PAGE_SETUP_JS = """
+// Разрешаем всплывающие окна
+window.original_open = window.open;
+window.open = function() {
+    return window.original_open.apply(this, arguments);
+};
+// Разрешаем уведомления
+if (navigator.permissions) {
+    navigator.permissions.query({name: 'notifications'}).then(function(permission) {
+        if (permission.state === 'prompt' || permission.state === 'denied') {
+            console.log('Allowing notifications');
+        }
+    });
+}
+"""
+
 class BrowserManager:
     """
     Класс для управления браузером с использованием Selenium и undetected_chromedriver
     """
     
-    def __init__(self, headless=False, timeout=30):
+    # Домены Ozon (oz.by - белорусская версия) и сервисы сокращения ссылок
+    _OZON_DOMAIN_RE = re.compile(r'ozon\.ru|oz\.by')
+    _SHORT_URL_RE = re.compile(r'vk\.cc|goo\.gl|bit\.ly|t\.co')
+    
+    def __init__(self, headless=False, timeout=30, block_images=True, use_pool=True):
         """
         Инициализация менеджера браузера
         
         :param headless: Запускать браузер в фоновом режиме (без интерфейса)
         :param timeout: Таймаут ожидания элементов на странице (в секундах)
+        :param block_images: Не загружать изображения на страницах (URL остаются в DOM)
+        :param use_pool: Брать браузер из общего пула вместо запуска отдельного процесса Chrome.
+                         Общий браузер нельзя использовать из нескольких потоков одновременно
         """
         self.driver = None
         self.headless = headless
         self.timeout = timeout
-        self.ozon_domain_pattern = re.compile(r'(^|\.)ozon\.ru$')
+        self.block_images = block_images
+        self.use_pool = use_pool
+        
+        # Пул вкладок текущего браузера: свободные вкладки и ограничение их общего числа
+        self._idle_tabs = deque()
+        self._own_tabs = set()
+        self._tab_slots = threading.Semaphore(MAX_TABS_PER_INSTANCE)
+        
+        # Одновременные вызовы open_browser ждут один запуск вместо запуска нескольких Chrome
+        self._launch_lock = threading.Lock()
+        self._launch_future = None
+        
+        # Количество неудачных перезапусков вкладки подряд
+        self._tab_restart_failures = 0
         logger.debug(f"Инициализация BrowserManager (headless={headless}, timeout={timeout})")
     
     def open_browser(self):
         """
-        Открывает браузер Chrome с необходимыми настройками
+        Открывает браузер Chrome с необходимыми настройками.
+        При use_pool=True переиспользует уже запущенный браузер из общего пула.
         
         :return: Экземпляр WebDriver
         """
+        with self._launch_lock:
+            # Браузер уже открыт этим менеджером - повторно не запускаем
+            if self._is_driver_alive():
+                return self.driver
+            
+            future = self._launch_future
+            is_owner = future is None
+            if is_owner:
+                future = self._launch_future = Future()
+        
+        if not is_owner:
+            return future.result()
+        
+        try:
+            if self.use_pool:
+                driver = browser_pool.acquire((self.headless, self.block_images), self._launch_driver)
+            else:
+                driver = self._launch_driver()
+        except BaseException as e:
+            with self._launch_lock:
+                self._launch_future = None
+            future.set_exception(e)
+            raise
+        
+        with self._launch_lock:
+            self.driver = driver
+            self._reset_tabs()
+            self._launch_future = None
+        future.set_result(driver)
+        return driver
+    
+    @staticmethod
+    def _setup_tab(driver):
+        """
+        Настройка текущей вкладки через CDP: блокировка сторонних запросов и скрипт
+        разрешения всплывающих окон, который Chrome выполняет до скриптов каждой страницы
+        
+        :param driver: Экземпляр WebDriver
+        """
+        # Запросы к счетчикам и рекламе блокируются на уровне сети
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"Не удалось настроить блокировку сторонних запросов: {e}")
+        
+        # Скрипт регистрируется один раз и сохраняется при переходах между страницами
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": PAGE_SETUP_JS})
+        except Exception as e:
+            logger.warning(f"CDP недоступен, скрипт настройки выполняется только для текущей страницы: {e}")
+            driver.execute_script(PAGE_SETUP_JS)
+    
+    def _reset_tabs(self):
+        """
+        Сброс пула вкладок при смене экземпляра браузера
+        """
+        self._idle_tabs.clear()
+        self._own_tabs.clear()
+        self._tab_slots = threading.Semaphore(MAX_TABS_PER_INSTANCE)
+    
+    def _is_driver_alive(self) -> bool:
+        """
+        Проверка, что процесс chromedriver принимает соединения, а браузер отвечает на команды
+        
+        :return: True если драйвером можно пользоваться
+        """
+        try:
+            return (
+                bool(self.driver)
+                and self.driver.service.is_connectable()
+                and bool(self.driver.window_handles)
+            )
+        except Exception:
+            return False
+    
+    def _ensure_driver(self):
+        """
+        Проверка браузера перед выполнением команд: если браузер упал, он перезапускается,
+        чтобы команды не зависали до истечения таймаута
+        """
+        if not self.driver:
+            logger.error("Браузер не инициализирован")
+            raise Exception("Браузер не инициализирован. Сначала вызовите метод open_browser()")
+        
+        if not self._is_driver_alive():
+            logger.warning("Браузер не отвечает, перезапускаем")
+            self.restart_browser()
+    
+    def acquire_tab(self):
+        """
+        Переключение на свободную вкладку браузера: берется вкладка из пула
+        или открывается новая через CDP Target.createTarget
+        
+        :return: Handle вкладки (совпадает с targetId CDP)
+        """
+        if not self.driver:
+            logger.error("Браузер не инициализирован")
+            raise Exception("Браузер не инициализирован. Сначала вызовите метод open_browser()")
+        
+        if self._idle_tabs:
+            handle = self._idle_tabs.pop()
+            self.driver.switch_to.window(handle)
+        else:
+            if not self._tab_slots.acquire(timeout=self.timeout):
+                raise Exception(f"Превышено количество вкладок браузера ({MAX_TABS_PER_INSTANCE})")
+            try:
+                handle = self.driver.execute_cdp_cmd("Target.createTarget", {"url": "about:blank"})["targetId"]
+            except Exception:
+                self._tab_slots.release()
+                raise
+            self._own_tabs.add(handle)
+            self.driver.switch_to.window(handle)
+            # Команды CDP относятся к текущей вкладке - новую вкладку настраиваем отдельно
+            self._setup_tab(self.driver)
+        
+        logger.debug(f"Получена вкладка браузера: {handle}")
+        return handle
+    
+    def release_tab(self, handle, close=False):
+        """
+        Возврат вкладки в пул (с переходом на about:blank) или её закрытие
+        
+        :param handle: Handle вкладки
+        :param close: Закрыть вкладку через CDP Target.closeTarget вместо возврата в пул
+        """
+        if not self.driver:
+            return
+        
+        try:
+            if close:
+                self.driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+            else:
+                self.driver.switch_to.window(handle)
+                self.driver.get("about:blank")
+                self._idle_tabs.append(handle)
+                return
+        except Exception as e:
+            logger.warning(f"Ошибка при освобождении вкладки {handle}: {e}")
+        
+        if handle in self._own_tabs:
+            self._own_tabs.discard(handle)
+            self._tab_slots.release()
+    
+    def _launch_driver(self):
+        """
+        Запуск нового процесса Chrome с необходимыми настройками
+        
+        :return: Экземпляр WebDriver
+        """
+        # undetected_chromedriver тяжелый при импорте, поэтому загружается только при запуске браузера
+        import undetected_chromedriver as uc
+        
+        driver = None
         try:
             logger.info("Открываем браузер...")
             
@@ -58,6 +333,16 @@ class BrowserManager:
             # Настройка политики содержимого для разрешения всплывающих окон
             chrome_options.add_argument('--disable-site-isolation-trials')
             
+            # Изображения не нужны для разбора страниц: адреса картинок берутся из атрибутов
+            if self.block_images:
+                chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            
+            # Отключаем панель перевода страниц (китайские страницы 1688.com вызывают её при каждой загрузке)
+            chrome_options.add_argument('--disable-features=TranslateUI')
+            
+            # Управление возвращается после DOMContentLoaded, без ожидания всех ресурсов страницы
+            chrome_options.page_load_strategy = 'eager'
+            
             # Используем экспериментальные опции
             chrome_prefs = {
                 "profile.default_content_setting_values.notifications": 1,  # 1=разрешить, 2=блокировать
@@ -67,6 +352,9 @@ class BrowserManager:
                 "download.directory_upgrade": True,
                 "safebrowsing.enabled": True
             }
+            if self.block_images:
+                chrome_prefs["profile.managed_default_content_settings.images"] = 2  # 2=блокировать
+                chrome_prefs["profile.default_content_setting_values.images"] = 2
             chrome_options.add_experimental_option("prefs", chrome_prefs)
             
             # Создаем драйвер с указанными опциями
@@ -78,37 +366,19 @@ class BrowserManager:
             # Устанавливаем таймаут загрузки страницы
             driver.set_page_load_timeout(60)
             
-            # Настраиваем JavaScript для разрешения всплывающих окон
-            setup_script = """
-            // Разрешаем всплывающие окна
-            window.original_open = window.open;
-            window.open = function() {
-                return window.original_open.apply(this, arguments);
-            };
-            // Разрешаем уведомления
-            if (navigator.permissions) {
-                navigator.permissions.query({name: 'notifications'}).then(function(permission) {
-                    if (permission.state === 'prompt' || permission.state === 'denied') {
-                        console.log('Allowing notifications');
-                    }
-                });
-            }
-            """
-            driver.execute_script(setup_script)
+            self._setup_tab(driver)
             
             logger.info("Браузер успешно открыт")
             
-            self.driver = driver
             return driver
             
         except Exception as e:
             logger.error(f"Ошибка при открытии браузера: {e}")
-            if self.driver:
+            if driver:
                 try:
-                    self.driver.quit()
+                    driver.quit()
                 except:
                     pass
-                self.driver = None
             raise e
     
     def navigate_to_url(self, url):
@@ -117,14 +387,12 @@ class BrowserManager:
         
         :param url: URL страницы для перехода
         """
-        if not self.driver:
-            logger.error("Браузер не инициализирован")
-            raise Exception("Браузер не инициализирован. Сначала вызовите метод open_browser()")
+        self._ensure_driver()
         
         logger.debug(f"Переход по URL: {url}")
         self.driver.get(url)
         logger.debug("Ожидание полной загрузки страницы")
-        time.sleep(3)  # Даем странице полностью загрузиться
+        self.wait_for_page_ready()
         
         # Проверка наличия капчи или блокировки на странице 1688.com
         if "1688.com" in url:
@@ -132,6 +400,22 @@ class BrowserManager:
             
         logger.debug(f"Страница загружена: {self.driver.title}")
     
+    def wait_for_page_ready(self, timeout=None):
+        """
+        Ожидание полной загрузки документа (document.readyState == 'complete')
+        
+        :param timeout: Максимальное время ожидания в секундах (по умолчанию self.timeout)
+        :return: True если страница загружена, False если истек таймаут
+        """
+        try:
+            WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=0.1).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+            return True
+        except TimeoutException:
+            logger.warning("Страница не загрузилась полностью за отведенное время")
+            return False
+    
     def check_and_handle_captcha(self):
         """
         Проверяет наличие капчи на странице 1688.com и пытается её решить
@@ -139,127 +423,75 @@ class BrowserManager:
         """
         try:
             # Проверяем наличие элемента капчи
-            captcha_container = self.driver.find_elements(By.CLASS_NAME, "J_MIDDLEWARE_FRAME_WIDGET")
-            
-            if captcha_container and captcha_container[0].is_displayed():
+            if self._captcha_visible():
                 logger.warning("Обнаружено окно проверки человека (капча) при загрузке страницы")
                 
-                # Получаем все iframe на странице
-                iframes = self.driver.find_elements(By.TAG_NAME, "iframe")
+                # Ищем iframe капчи (src содержит punish) одним запросом к браузеру
+                iframe = self.driver.execute_script(PUNISH_IFRAME_JS)
                 
-                if iframes:
-                    # Перебираем все iframe и пытаемся найти тот, который связан с капчей
-                    for iframe in iframes:
-                        src = iframe.get_attribute("src")
-                        if src and "punish" in src:
-                            logger.info("Найден iframe с капчей, пытаемся решить")
+                if iframe:
+                    logger.info("Найден iframe с капчей, пытаемся решить")
+                    
+                    # Смещение содержимого iframe в окне - нужно для событий мыши через CDP
+                    frame_offset = self.driver.execute_script(FRAME_OFFSET_JS, iframe)
+                    
+                    # Переключаемся на frame капчи
+                    self.driver.switch_to.frame(iframe)
+                    
+                    # Ищем слайдер или другие элементы капчи
+                    slider_dragged = False
+                    try:
+                        # Поиск слайдера и проверка его видимости одним запросом
+                        slider = self._find_visible(".nc_iconfont.btn_slide")
+                        
+                        if slider:
+                            logger.info("Найден слайдер капчи, выполняем естественное перетаскивание")
                             
-                            # Переключаемся на frame капчи
-                            self.driver.switch_to.frame(iframe)
+                            # Получаем размер элемента и слайдера
+                            track_element = self.driver.find_element(By.CSS_SELECTOR, ".nc-lang-cnt")
+                            track_width = track_element.size['width']
                             
-                            # Ищем слайдер или другие элементы капчи
-                            try:
-                                # Ищем различные типы элементов капчи
-                                from selenium.webdriver.common.action_chains import ActionChains
-                                import random
-                                import time
-                                
-                                slider = self.driver.find_element(By.CSS_SELECTOR, ".nc_iconfont.btn_slide")
-                                
-                                if slider and slider.is_displayed():
-                                    logger.info("Найден слайдер капчи, выполняем естественное перетаскивание")
-                                    
-                                    # Получаем размер элемента и слайдера
-                                    track_element = self.driver.find_element(By.CSS_SELECTOR, ".nc-lang-cnt")
-                                    track_width = track_element.size['width']
-                                    
-                                    # Создаем цепочку действий
-                                    action = ActionChains(self.driver)
-                                    
-                                    # Нажимаем и удерживаем слайдер
-                                    action.click_and_hold(slider).perform()
-                                    
-                                    # Определяем минимальное количество шагов
-                                    num_steps = random.randint(5, 8)  # Минимальное количество шагов для высокой скорости
-                                    
-                                    # Создаем сверхбыстрый профиль движения
-                                    total_duration = random.uniform(0.05, 0.08)  # Сверхкороткое время на весь процесс
-                                    step_time = total_duration / num_steps  # Время на один шаг (минимальное)
-                                    
-                                    # Начальное положение
-                                    current_x = 0
-                                    
-                                    # Быстрое и плавное движение с минимальными паузами
-                                    for i in range(num_steps):
-                                        # Линейное движение для максимальной скорости
-                                        progress = i / (num_steps - 1)  # От 0 до 1
-                                        
-                                        # Целевая позиция для текущего шага
-                                        target_x = track_width * progress
-                                        
-                                        # Размер следующего перемещения
-                                        move_size = target_x - current_x
-                                        
-                                        # Перемещаем слайдер на следующую позицию без вариаций
-                                        action.move_by_offset(move_size, 0).perform()
-                                        current_x += move_size
-                                        
-                                        # Минимальная микро-пауза
-                                        if i < num_steps - 1:  # Пропускаем паузу на последнем шаге
-                                            time.sleep(step_time)
-                                    
-                                    # Отпускаем слайдер без задержки
-                                    action.release().perform()
-                                    
-                                    logger.info("Выполнено быстрое перетаскивание слайдера")
-                                    
-                                    # Ждем успешной верификации минимальное время
-                                    time.sleep(0.5)
-                            except Exception as slider_error:
-                                logger.info(f"Слайдер капчи не найден или произошла ошибка: {slider_error}")
-                                
-                                # Пытаемся найти кнопку для решения капчи
-                                try:
-                                    # Ищем кнопки или элементы для взаимодействия
-                                    buttons = self.driver.find_elements(By.TAG_NAME, "button")
-                                    for button in buttons:
-                                        if button.is_displayed():
-                                            button.click()
-                                            logger.info("Нажата кнопка в форме капчи")
-                                            time.sleep(0.3)  # Минимальное время ожидания
-                                            break
-                                except Exception as button_error:
-                                    logger.warning(f"Не удалось найти кнопки в форме капчи: {button_error}")
+                            self._drag_slider(slider, track_width, frame_offset)
+                            slider_dragged = True
                             
-                            # Возвращаемся к основному содержимому страницы
-                            self.driver.switch_to.default_content()
-                            break
+                            logger.info("Выполнено быстрое перетаскивание слайдера")
+                        else:
+                            logger.info("Слайдер капчи не найден")
+                    except Exception as slider_error:
+                        logger.info(f"Ошибка при перетаскивании слайдера капчи: {slider_error}")
+                    
+                    if not slider_dragged:
+                        # Пытаемся найти кнопку для решения капчи
+                        try:
+                            # Поиск первой видимой кнопки и нажатие одним запросом к браузеру
+                            if self.driver.execute_script(CLICK_VISIBLE_BUTTON_JS):
+                                logger.info("Нажата кнопка в форме капчи")
+                        except Exception as button_error:
+                            logger.warning(f"Не удалось найти кнопки в форме капчи: {button_error}")
+                    
+                    # Возвращаемся к основному содержимому страницы
+                    self.driver.switch_to.default_content()
                 
                 # Проверяем, исчезла ли капча после попытки решения - сокращаем время проверки
                 try:
-                    time.sleep(0.5)  # Минимальное время на обработку капчи
-                    
-                    # Проверяем, все еще видна ли капча
-                    captcha_container = self.driver.find_elements(By.CLASS_NAME, "J_MIDDLEWARE_FRAME_WIDGET")
-                    if captcha_container and captcha_container[0].is_displayed():
+                    # Ждем верификации: проверка завершается сразу после исчезновения капчи
+                    if not self._wait_captcha_hidden(1):
                         logger.warning("Капча все еще отображается, пробуем закрыть или перезагрузить страницу")
                         
                         # Пробуем нажать на крестик для закрытия окна
                         try:
-                            close_button = self.driver.find_element(By.CSS_SELECTOR, ".J_MIDDLEWARE_FRAME_WIDGET img")
-                            if close_button and close_button.is_displayed():
+                            close_button = self._find_visible(".J_MIDDLEWARE_FRAME_WIDGET img")
+                            if close_button:
                                 close_button.click()
                                 logger.info("Нажата кнопка закрытия окна капчи")
-                                time.sleep(1)
                         except Exception as close_error:
                             logger.warning(f"Не удалось закрыть окно капчи: {close_error}")
                         
                         # Если капча все еще отображается, перезагружаем страницу
-                        captcha_container = self.driver.find_elements(By.CLASS_NAME, "J_MIDDLEWARE_FRAME_WIDGET")
-                        if captcha_container and captcha_container[0].is_displayed():
+                        if not self._wait_captcha_hidden(1):
                             logger.info("Перезагружаем страницу для обхода капчи")
                             self.driver.refresh()
-                            time.sleep(5)
+                            self.wait_for_page_ready()
                     else:
                         logger.info("Капча успешно обработана")
                 except Exception as check_error:
@@ -271,6 +503,126 @@ class BrowserManager:
             logger.error(f"Ошибка при обработке капчи: {e}")
             return False
     
+    def _captcha_visible(self):
+        """
+        Проверка видимости окна капчи одним запросом к браузеру
+        
+        :return: True если окно капчи отображается
+        """
+        return self._find_visible('.J_MIDDLEWARE_FRAME_WIDGET') is not None
+    
+    def _find_visible(self, css_selector):
+        """
+        Поиск элемента с проверкой его видимости одним запросом к браузеру
+        
+        :param css_selector: CSS-селектор элемента
+        :return: Элемент WebElement или None, если он не найден или скрыт
+        """
+        return self.driver.execute_script(FIND_VISIBLE_JS, css_selector)
+    
+    def _wait_captcha_hidden(self, timeout):
+        """
+        Ожидание исчезновения окна капчи
+        
+        :param timeout: Максимальное время ожидания в секундах
+        :return: True если окно капчи скрыто, False если истек таймаут
+        """
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda driver: not self._captcha_visible()
+            )
+            return True
+        except TimeoutException:
+            return False
+    
+    def _drag_slider(self, slider, track_width, frame_offset):
+        """
+        Быстрое перетаскивание слайдера капчи на всю ширину дорожки
+        
+        :param slider: Элемент слайдера (драйвер переключен на iframe капчи)
+        :param track_width: Ширина дорожки слайдера в пикселях
+        :param frame_offset: Смещение iframe капчи в окне [x, y]
+        """
+        # Определяем минимальное количество шагов
+        num_steps = random.randint(5, 8)  # Минимальное количество шагов для высокой скорости
+        
+        # Создаем сверхбыстрый профиль движения
+        total_duration = random.uniform(0.05, 0.08)  # Сверхкороткое время на весь процесс
+        step_time = total_duration / num_steps  # Время на один шаг (минимальное)
+        
+        if not self._drag_slider_cdp(slider, track_width, frame_offset, num_steps, step_time):
+            self._drag_slider_actions(slider, track_width, num_steps, step_time)
+    
+    def _drag_slider_cdp(self, slider, track_width, frame_offset, num_steps, step_time):
+        """
+        Перетаскивание слайдера событиями мыши CDP Input.dispatchMouseEvent.
+        События доверенные, как при реальном вводе, и не проходят через WebDriver Actions.
+        
+        :param slider: Элемент слайдера (драйвер переключен на iframe капчи)
+        :param track_width: Ширина дорожки слайдера в пикселях
+        :param frame_offset: Смещение iframe капчи в окне [x, y]
+        :param num_steps: Количество шагов перемещения
+        :param step_time: Пауза между шагами в секундах
+        :return: True если перетаскивание выполнено, False если CDP недоступен
+        """
+        try:
+            center_x, center_y = self.driver.execute_script(ELEMENT_CENTER_JS, slider)
+            start_x = frame_offset[0] + center_x
+            y = frame_offset[1] + center_y
+            
+            def dispatch(event_type, x, buttons):
+                self.driver.execute_cdp_cmd("Input.dispatchMouseEvent", {
+                    "type": event_type, "x": x, "y": y,
+                    "button": "left", "buttons": buttons, "clickCount": 1
+                })
+            
+            # Нажимаем и удерживаем слайдер
+            dispatch("mousePressed", start_x, 1)
+            
+            # Быстрое и плавное линейное движение с минимальными паузами
+            for i in range(num_steps):
+                progress = i / (num_steps - 1)  # От 0 до 1
+                dispatch("mouseMoved", start_x + track_width * progress, 1)
+                if i < num_steps - 1:  # Пропускаем паузу на последнем шаге
+                    time.sleep(step_time)
+            
+            # Отпускаем слайдер без задержки
+            dispatch("mouseReleased", start_x + track_width, 0)
+            return True
+        except (WebDriverException, TypeError, ValueError) as e:
+            logger.debug(f"Не удалось перетащить слайдер через CDP: {e}")
+            return False
+    
+    def _drag_slider_actions(self, slider, track_width, num_steps, step_time):
+        """
+        Перетаскивание слайдера через ActionChains (запасной способ без CDP)
+        
+        :param slider: Элемент слайдера
+        :param track_width: Ширина дорожки слайдера в пикселях
+        :param num_steps: Количество шагов перемещения
+        :param step_time: Пауза между шагами в секундах
+        """
+        from selenium.webdriver.common.action_chains import ActionChains
+        
+        # Смещения всех шагов считаются заранее, а все перетаскивание собирается в одну
+        # цепочку действий: паузы между шагами выполняет сам браузер, команда отправляется один раз
+        targets = [track_width * i / (num_steps - 1) for i in range(num_steps)]
+        deltas = [target - previous for previous, target in zip([0] + targets, targets)]
+        
+        # Нажимаем и удерживаем слайдер
+        action = ActionChains(self.driver)
+        action.click_and_hold(slider)
+        
+        # Быстрое и плавное линейное движение с минимальными паузами
+        for i, move_size in enumerate(deltas):
+            action.move_by_offset(move_size, 0)
+            if i < num_steps - 1:  # Пропускаем паузу на последнем шаге
+                action.pause(step_time)
+        
+        # Отпускаем слайдер без задержки
+        action.release()
+        action.perform()
+    
     def is_ozon_url(self, url):
         """
         Проверяет, что URL относится к сайту Ozon
@@ -281,30 +633,23 @@ class BrowserManager:
         logger.debug(f"Проверка URL на принадлежность к Ozon: {url}")
         
         # Проверка на короткую или полную ссылку Ozon
-        if 'ozon.ru' in url:
-            logger.debug("URL содержит домен ozon.ru")
-            return True
-        elif 'oz.by' in url:  # Белорусская версия Ozon
-            logger.debug("URL содержит домен oz.by (белорусская версия Ozon)")
+        domain_match = self._OZON_DOMAIN_RE.search(url)
+        if domain_match:
+            logger.debug(f"URL содержит домен {domain_match.group()}")
             return True
         
         # Проверка на сокращенные ссылки Ozon
-        ozon_short_urls = ['vk.cc', 'goo.gl', 'bit.ly', 't.co']
-        for short_url in ozon_short_urls:
-            if short_url in url:
-                logger.debug(f"Обнаружена сокращенная ссылка: {short_url}")
-                # Для коротких ссылок нужно перейти по ним и проверить конечный URL
-                try:
-                    logger.debug("Открываем временный браузер для проверки перенаправления")
-                    temp_driver = webdriver.Chrome()
-                    temp_driver.get(url)
-                    final_url = temp_driver.current_url
-                    temp_driver.quit()
-                    logger.debug(f"Конечный URL после перенаправления: {final_url}")
-                    return self.is_ozon_url(final_url)
-                except Exception as e:
-                    logger.error(f"Ошибка при проверке сокращенной ссылки: {e}")
-                    return False
+        short_match = self._SHORT_URL_RE.search(url)
+        if short_match:
+            logger.debug(f"Обнаружена сокращенная ссылка: {short_match.group()}")
+            # Для коротких ссылок нужно перейти по ним и проверить конечный URL
+            try:
+                final_url = _resolve_redirect(url)
+                logger.debug(f"Конечный URL после перенаправления: {final_url}")
+                return self.is_ozon_url(final_url)
+            except requests.RequestException as e:
+                logger.error(f"Ошибка при проверке сокращенной ссылки: {e}")
+                return False
         
         logger.debug("URL не относится к Ozon")
         return False
@@ -315,11 +660,21 @@ class BrowserManager:
         
         :return: Словарь с информацией об окнах {window_handle: {'title': title, 'url': url}}
         """
-        if not self.driver:
-            logger.error("Браузер не инициализирован")
-            raise Exception("Браузер не инициализирован. Сначала вызовите метод open_browser()")
+        self._ensure_driver()
         
         logger.debug("Получение информации обо всех открытых окнах")
+        
+        # Все вкладки одним запросом через CDP: handle окна в chromedriver совпадает с targetId
+        try:
+            targets = self.driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+            return {
+                target["targetId"]: {'title': target["title"], 'url': target["url"]}
+                for target in targets
+                if target.get("type") == "page"
+            }
+        except Exception as e:
+            logger.debug(f"CDP недоступен, получаем информацию через переключение окон: {e}")
+        
         windows_info = {}
         current_handle = self.driver.current_window_handle
         
@@ -347,33 +702,25 @@ class BrowserManager:
         :param selector: CSS-селектор элемента, к которому нужно прокрутить
         :param scroll_amount: Количество пикселей для прокрутки
         """
-        if not self.driver:
-            logger.error("Браузер не инициализирован")
-            raise Exception("Браузер не инициализирован. Сначала вызовите метод open_browser()")
+        self._ensure_driver()
         
         # Прокрутка к элементу по ID
         if element_id:
             logger.debug(f"Попытка прокрутки к элементу с ID: {element_id}")
-            try:
-                element = self.driver.find_element(By.ID, element_id)
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                # Немного прокручиваем вверх, чтобы элемент не был под шапкой сайта
-                self.driver.execute_script("window.scrollBy(0, -120);")
+            # Поиск элемента и прокрутка (с отступом под шапку сайта) одним запросом
+            if self.driver.execute_script(SCROLL_TO_ELEMENT_JS, element_id, None):
                 logger.debug(f"Успешная прокрутка к элементу с ID: {element_id}")
                 return True
-            except NoSuchElementException:
+            else:
                 logger.warning(f"Элемент с ID '{element_id}' не найден. Пробуем альтернативные методы прокрутки.")
         
         # Прокрутка к элементу по селектору
         if selector:
             logger.debug(f"Попытка прокрутки к элементу с селектором: {selector}")
-            try:
-                element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                self.driver.execute_script("window.scrollBy(0, -120);")
+            if self.driver.execute_script(SCROLL_TO_ELEMENT_JS, None, selector):
                 logger.debug(f"Успешная прокрутка к элементу с селектором: {selector}")
                 return True
-            except NoSuchElementException:
+            else:
                 logger.warning(f"Элемент с селектором '{selector}' не найден. Пробуем альтернативные методы прокрутки.")
         
         # Прокрутка на указанное количество пикселей
@@ -392,15 +739,26 @@ class BrowserManager:
         """
         Закрывает браузер и освобождает ресурсы
         """
+        if self.driver and self.use_pool:
+            # Общий браузер возвращается в пул и закрывается, когда его никто не использует
+            browser_pool.release(self.driver)
+            self.driver = None
+            return
+        
         if self.driver:
             try:
                 logger.info("Закрываем браузер...")
                 
-                # Закрываем все окна браузера
+                # Закрываем лишние вкладки через CDP без переключения между окнами
+                # (последняя вкладка закроется вместе с драйвером)
                 try:
-                    for handle in self.driver.window_handles:
-                        self.driver.switch_to.window(handle)
-                        self.driver.close()
+                    targets = self.driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+                    pages = [target["targetId"] for target in targets if target.get("type") == "page"]
+                    for target_id in pages[1:]:
+                        try:
+                            self.driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+                        except Exception as target_error:
+                            logger.debug(f"Не удалось закрыть вкладку {target_id}: {target_error}")
                 except Exception as window_error:
                     logger.warning(f"Ошибка при закрытии окон браузера: {window_error}")
                 
@@ -423,14 +781,72 @@ class BrowserManager:
                 
     def restart_browser(self, startup_url=None):
         """
-        Перезапускает браузер и возвращает новый экземпляр WebDriver
+        Перезапускает браузер и возвращает экземпляр WebDriver.
+        Если браузер отвечает, открывается новая вкладка вместо перезапуска процесса;
+        полный перезапуск выполняется для упавшего браузера или после двух
+        неудачных перезапусков вкладки подряд
+        
+        :param startup_url: URL для перехода после запуска браузера (опционально)
+        :return: Экземпляр WebDriver
+        """
+        if self._is_driver_alive() and self._tab_restart_failures < 2:
+            try:
+                driver = self.restart_tab(startup_url)
+                self._tab_restart_failures = 0
+                return driver
+            except Exception as e:
+                self._tab_restart_failures += 1
+                logger.warning(f"Не удалось перезапустить вкладку ({self._tab_restart_failures} раз подряд): {e}")
+                if self._tab_restart_failures < 2:
+                    return self.driver
+        
+        return self.restart_browser_full(startup_url)
+    
+    def restart_tab(self, startup_url=None):
+        """
+        Замена текущей вкладки новой без перезапуска процесса браузера
+        
+        :param startup_url: URL для перехода в новой вкладке (опционально)
+        :return: Экземпляр WebDriver
+        """
+        logger.info("Перезапуск вкладки браузера...")
+        old_handle = self.driver.current_window_handle
+        self.acquire_tab()
+        self.release_tab(old_handle, close=True)
+        
+        if startup_url:
+            logger.info(f"Переход по URL после перезапуска: {startup_url}")
+            self.navigate_to_url(startup_url)
+        return self.driver
+    
+    def restart_browser_full(self, startup_url=None):
+        """
+        Полный перезапуск процесса браузера
         
         :param startup_url: URL для перехода после запуска браузера (опционально)
         :return: Новый экземпляр WebDriver
         """
+        self._tab_restart_failures = 0
         logger.info("Перезапуск браузера...")
         
-        # Закрываем текущий браузер, если он открыт
+        # Закрываем текущий браузер, если он открыт (общий браузер убираем из пула,
+        # чтобы открыть новый процесс, а не получить тот же самый)
+        if self.driver and self.use_pool:
+            if not self._is_driver_alive():
+                # Не отвечающий браузер бесполезен всем пользователям пула
+                browser_pool.discard(self.driver)
+            elif not browser_pool.discard_if_unshared(self.driver):
+                # Рабочий браузер используют другие - не закрываем его, а снова берем из пула
+                logger.info("Браузер используется другими задачами, перезапуск пропущен")
+            self.driver = None
+        elif self.driver and not self._is_driver_alive():
+            # Браузер не отвечает - закрывать окна бесполезно,
+            # только завершаем процессы драйвера и браузера
+            try:
+                self.driver.quit()
+            except Exception as quit_error:
+                logger.debug(f"Ошибка при закрытии неотвечающего драйвера: {quit_error}")
+            self.driver = None
         self.close_browser()
         
         # Открываем новый браузер
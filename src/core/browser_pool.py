@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import threading
+from concurrent.futures import Future
+from src.utils.logger import logger
+
+# Время (в секундах), в течение которого браузер без пользователей остается открытым
+# для повторного использования, прежде чем будет закрыт
+POOL_IDLE_TIMEOUT = 60
+
+
+class _PoolEntry:
+    """
+    Состояние одного общего браузера в пуле
+    """
+
+    def __init__(self):
+        self.driver = None
+        self.refcount = 0
+        self.launch_future = None
+        self.idle_timer = None
+
+
+class BrowserPool:
+    """
+    Пул общих экземпляров Chrome с подсчетом ссылок.
+
+    Для каждого набора настроек (ключа) держится один браузер. Одновременные вызовы
+    acquire ждут один и тот же запуск, а не запускают каждый свой Chrome.
+    Браузер закрывается, когда его никто не использует дольше idle_timeout.
+    """
+
+    def __init__(self, idle_timeout: float = POOL_IDLE_TIMEOUT):
+        """
+        Инициализация пула
+
+        :param idle_timeout: Время простоя до закрытия браузера (0 - закрывать сразу)
+        """
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, launcher):
+        """
+        Получение общего браузера для указанного ключа
+
+        :param key: Ключ настроек браузера
+        :param launcher: Функция без аргументов, запускающая новый WebDriver
+        :return: Экземпляр WebDriver
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.setdefault(key, _PoolEntry())
+                self._cancel_idle_timer(entry)
+
+                future = entry.launch_future
+                if future is None:
+                    # Работающий браузер отдаем сразу
+                    if entry.driver is not None and self._is_alive(entry.driver):
+                        entry.refcount += 1
+                        return entry.driver
+
+                    # Браузера нет - запускаем его сами, остальные будут ждать этот запуск
+                    dead_driver = entry.driver
+                    entry.driver = None
+                    entry.refcount = 0
+                    future = entry.launch_future = Future()
+                    is_launcher = True
+                else:
+                    dead_driver = None
+                    is_launcher = False
+
+            if not is_launcher:
+                driver = future.result()
+                with self._lock:
+                    # Браузер могли закрыть, пока мы ждали запуска - тогда пробуем снова
+                    if entry.driver is driver:
+                        entry.refcount += 1
+                        return driver
+                continue
+
+            if dead_driver is not None:
+                logger.warning("Браузер в пуле не отвечает, запускаем новый")
+                self._quit(dead_driver)
+
+            try:
+                driver = launcher()
+            except BaseException as e:
+                with self._lock:
+                    entry.launch_future = None
+                future.set_exception(e)
+                raise
+
+            with self._lock:
+                entry.driver = driver
+                entry.refcount = 1
+                entry.launch_future = None
+            future.set_result(driver)
+            return driver
+
+    def release(self, driver):
+        """
+        Возврат браузера в пул. Когда пользователей не остается, браузер
+        закрывается после idle_timeout
+
+        :param driver: Экземпляр WebDriver, полученный из acquire
+        """
+        with self._lock:
+            key, entry = self._find_entry(driver)
+            if entry is None:
+                return
+            if entry.refcount > 1:
+                entry.refcount -= 1
+                return
+
+            if self.idle_timeout <= 0:
+                entry.driver = None
+                entry.refcount = 0
+                close_now = True
+            else:
+                # Пока закрываются лишние вкладки, браузер остается занятым:
+                # новые вызовы acquire ждут этот future так же, как запуск браузера
+                future = entry.launch_future = Future()
+                close_now = False
+
+        if close_now:
+            self._quit(driver)
+            return
+
+        self._reset_windows(driver)
+
+        with self._lock:
+            entry.launch_future = None
+            # Браузер могли убрать из пула (discard/drain), пока закрывались вкладки
+            if entry.driver is driver:
+                entry.refcount = 0
+                entry.idle_timer = threading.Timer(self.idle_timeout, self._reap, (key, driver))
+                entry.idle_timer.daemon = True
+                entry.idle_timer.start()
+        future.set_result(driver)
+
+    def discard(self, driver):
+        """
+        Удаление браузера из пула и его закрытие независимо от числа пользователей
+        (например, перед принудительным перезапуском)
+
+        :param driver: Экземпляр WebDriver
+        """
+        with self._lock:
+            _, entry = self._find_entry(driver)
+            if entry is not None:
+                self._cancel_idle_timer(entry)
+                entry.driver = None
+                entry.refcount = 0
+        self._quit(driver)
+
+    def discard_if_unshared(self, driver) -> bool:
+        """
+        Закрытие браузера, только если его больше никто не использует.
+        Если браузер общий, он просто возвращается в пул, как при release
+
+        :param driver: Экземпляр WebDriver, полученный из acquire
+        :return: True если браузер был закрыт, False если им пользуются другие
+        """
+        with self._lock:
+            _, entry = self._find_entry(driver)
+            if entry is not None:
+                if entry.refcount > 1:
+                    entry.refcount -= 1
+                    return False
+                self._cancel_idle_timer(entry)
+                entry.driver = None
+                entry.refcount = 0
+        self._quit(driver)
+        return True
+
+    def drain(self):
+        """
+        Закрытие всех браузеров пула (при завершении работы)
+        """
+        with self._lock:
+            drivers = []
+            for entry in self._entries.values():
+                self._cancel_idle_timer(entry)
+                if entry.driver is not None:
+                    drivers.append(entry.driver)
+                entry.driver = None
+                entry.refcount = 0
+
+        for driver in drivers:
+            self._quit(driver)
+
+    def _reap(self, key, driver):
+        """
+        Закрытие браузера по истечении времени простоя
+
+        :param key: Ключ настроек браузера
+        :param driver: Экземпляр WebDriver, для которого был запущен таймер
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.driver is not driver or entry.refcount > 0:
+                return
+            entry.driver = None
+            entry.idle_timer = None
+
+        logger.info("Закрываем неиспользуемый браузер из пула")
+        self._quit(driver)
+
+    def _find_entry(self, driver):
+        """
+        Поиск записи пула по экземпляру WebDriver (вызывается под блокировкой)
+
+        :param driver: Экземпляр WebDriver
+        :return: Кортеж (ключ, запись) или (None, None)
+        """
+        for key, entry in self._entries.items():
+            if entry.driver is driver:
+                return key, entry
+        return None, None
+
+    @staticmethod
+    def _cancel_idle_timer(entry):
+        """
+        Отмена таймера закрытия браузера (вызывается под блокировкой)
+
+        :param entry: Запись пула
+        """
+        if entry.idle_timer is not None:
+            entry.idle_timer.cancel()
+            entry.idle_timer = None
+
+    @staticmethod
+    def _is_alive(driver) -> bool:
+        """
+        Проверка, что процесс chromedriver еще принимает соединения
+
+        :param driver: Экземпляр WebDriver
+        :return: True если драйвер доступен
+        """
+        try:
+            return driver.service.is_connectable()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset_windows(driver):
+        """
+        Закрытие лишних вкладок, чтобы следующий пользователь получил браузер с одной вкладкой
+
+        :param driver: Экземпляр WebDriver
+        """
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии вкладок браузера: {e}")
+
+    @staticmethod
+    def _quit(driver):
+        """
+        Закрытие браузера с игнорированием ошибок
+
+        :param driver: Экземпляр WebDriver
+        """
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии драйвера: {e}")
+
+
+# Общий пул браузеров процесса
+browser_pool = BrowserPool()
+atexit.register(browser_pool.drain)
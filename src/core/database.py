@@ -1,9 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from sqlalchemy import create_engine, and_, func
+from sqlalchemy import create_engine, event, insert, update, select, case, literal, bindparam, text, and_, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from contextlib import contextmanager
+from collections import Counter
+from dataclasses import dataclass
+import threading
+import time
 from src.core.models import Base, MatchedProduct, Task, OzonProduct, AlibabaProduct, ProductProfitability, User
 from src.utils.logger import logger
 from datetime import datetime, timedelta
@@ -11,24 +18,306 @@ import re
 import json
 import os
 
-from src.utils.utils import convert_price_to_usd
+try:
+    import orjson
+except ImportError:  # orjson не обязателен, без него используется стандартный json
+    orjson = None
+
+from src.utils.utils import convert_price_to_usd, RUB_TO_USD_RATE
+
+# Первое число (целое или с дробной частью, с запятыми-разделителями тысяч) в строке цены, продаж и т.п.
+_NUM_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# Время (в секундах), в течение которого статус задачи по URL берется из кеша.
+# Статусы меняются редко, а бот опрашивает их часто
+STATUS_CACHE_TTL = 2.0
+
+# Размер кеша скомпилированных SQL-выражений на движок
+QUERY_CACHE_SIZE = 1200
+
+# Запрос статуса задачи по URL строится один раз: он выполняется при каждом опросе
+_TASK_STATUS_STMT = select(Task.status).where(Task.url == bindparam('url')).limit(1)
+
+# Колонки записи о маржинальности, которые отдаются наружу
+PROFITABILITY_COLUMNS = (
+    ProductProfitability.id,
+    ProductProfitability.match_id,
+    ProductProfitability.ozon_name,
+    ProductProfitability.alibaba_name,
+    ProductProfitability.ozon_url,
+    ProductProfitability.alibaba_url,
+    ProductProfitability.selling_price,
+    ProductProfitability.purchase_price,
+    ProductProfitability.marketplace_commission,
+    ProductProfitability.taxes,
+    ProductProfitability.delivery_cost,
+    ProductProfitability.packaging_cost,
+    ProductProfitability.agent_commission,
+    ProductProfitability.total_profit,
+    ProductProfitability.profitability_percent,
+    ProductProfitability.weight,
+    ProductProfitability.dimensions,
+    ProductProfitability.created_at,
+)
+
+# Размер пачки строк при потоковом чтении записей о маржинальности
+PROFITABILITY_BATCH_SIZE = 1000
+
+# Размер пачки строк при чтении отчетов о товарах для набора URL
+PRODUCT_INFO_BATCH_SIZE = 1000
+
+# Размер пачки строк при потоковом чтении активных задач
+ACTIVE_TASKS_BATCH_SIZE = 500
+
+@dataclass(frozen=True)
+class ProfitabilityCoefficients:
+    """
+    Коэффициенты расчета маржинальности (суммы в USD)
+    """
+    marketplace_commission_rate: float = 0.27  # Комиссия маркетплейса от цены продажи
+    tax_rate: float = 0.07  # Налоги от цены продажи
+    delivery_cost_per_kg: float = 1.7  # Доставка по России за килограмм веса
+    packaging_cost: float = 0.1  # Расходные материалы на единицу товара
+    agent_commission_rate: float = 0.05  # Комиссия агента от цены покупки
+    
+    @property
+    def selling_cost_rate(self) -> float:
+        """Доля цены продажи, уходящая на комиссию маркетплейса и налоги"""
+        return self.marketplace_commission_rate + self.tax_rate
+    
+    @property
+    def purchase_cost_rate(self) -> float:
+        """Цена покупки вместе с комиссией агента, в долях от цены покупки"""
+        return 1 + self.agent_commission_rate
+
+PROFITABILITY_COEFFS = ProfitabilityCoefficients()
+
+# Количество соединений только для чтения в пуле
+READ_POOL_SIZE = 8
+# Дополнительные соединения чтения сверх пула при пиковой нагрузке
+READ_POOL_OVERFLOW = 4
+# Время жизни соединения в пуле (секунды)
+POOL_RECYCLE = 1800
+
+# Максимальное число идентификаторов в одном IN (...), чтобы не упереться в лимит параметров SQLite
+SQL_IN_CHUNK_SIZE = 500
+
+# Статусы задач, которые выводятся в статистике
+TASK_STATUSES = ('completed', 'not_found', 'error', 'failed', 'fatal', 'pending', 'ozon_processed')
+
+# Статусы задач, которые еще находятся в обработке
+ACTIVE_TASK_STATUSES = ('pending', 'ozon_processed')
+
+# Индексы по колонкам, по которым идут выборки. create_all не добавляет индексы
+# в уже существующие таблицы, поэтому они создаются отдельно при запуске
+INDEX_DDL = (
+    # Покрывающий индекс: проверка статуса задачи по URL не читает саму таблицу.
+    # Он заменяет прежний индекс только по url
+    "DROP INDEX IF EXISTS ix_tasks_url",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_url_status ON tasks (url, status)",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_status ON tasks (status)",
+    "CREATE INDEX IF NOT EXISTS ix_task_status_created ON tasks (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_ozon_products_product_id ON ozon_products (product_id)",
+    "CREATE INDEX IF NOT EXISTS ix_ozon_products_task_id ON ozon_products (task_id)",
+    "CREATE INDEX IF NOT EXISTS ix_alibaba_products_url ON alibaba_products (url)",
+    "CREATE INDEX IF NOT EXISTS ix_matched_products_ozon_product_id ON matched_products (ozon_product_id)",
+    "CREATE INDEX IF NOT EXISTS ix_matched_products_alibaba_product_id ON matched_products (alibaba_product_id)",
+    "CREATE INDEX IF NOT EXISTS ix_product_profitability_match_id ON product_profitability (match_id)",
+)
+
+def _parse_numeric(value) -> float:
+    """
+    Извлечение первого числа из строки вида "¥1,280.00", "复购率10.29%", "已售1万+件".
+    Запятые считаются разделителями тысяч, у диапазона цен берется нижняя граница
+    
+    :param value: Строка или число
+    :return: Число или 0.0, если числа в строке нет
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    match = _NUM_RE.search(str(value))
+    return float(match.group(0).replace(',', '')) if match else 0.0
+
+def _format_datetime(dt: datetime) -> str:
+    """
+    Форматирование даты в виде '%d.%m.%Y %H:%M' без разбора шаблона strftime
+    
+    :param dt: Дата и время
+    :return: Строка вида "31.12.2024 23:59"
+    """
+    return f"{dt.day:02d}.{dt.month:02d}.{dt.year} {dt.hour:02d}:{dt.minute:02d}"
+
+def _json_serializer(value) -> str:
+    """
+    Сериализация JSON-колонок (изображения, характеристики товара)
+    
+    :param value: Значение колонки
+    :return: JSON-строка
+    """
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+def _json_deserializer(value: str):
+    """
+    Разбор JSON-колонок
+    
+    :param value: JSON-строка из базы
+    :return: Значение колонки
+    """
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+class ActiveTask:
+    """
+    Активная задача с информацией о товарах (без словаря атрибутов на каждый объект)
+    """
+    __slots__ = ('task_id', 'url', 'status', 'created_at', 'ozon_name', 'ozon_url', 'alibaba_name', 'alibaba_url')
+    
+    def __init__(self, task_id, url, status, created_at, ozon_name, ozon_url, alibaba_name, alibaba_url):
+        self.task_id = task_id
+        self.url = url
+        self.status = status
+        self.created_at = created_at
+        self.ozon_name = ozon_name
+        self.ozon_url = ozon_url
+        self.alibaba_name = alibaba_name
+        self.alibaba_url = alibaba_url
+    
+    def to_dict(self) -> dict:
+        """
+        Преобразование в словарь (прежний формат get_active_tasks)
+        
+        :return: Словарь с данными задачи
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __repr__(self):
+        return f"<ActiveTask(task_id={self.task_id}, status='{self.status}', url='{self.url}')>"
 
 class Database:
+    # Пути баз, схема которых уже проверена в этом процессе
+    _schema_checked = set()
+    _schema_lock = threading.Lock()
+    # Блокировки записи по путям баз: SQLite допускает одного писателя,
+    # поэтому транзакции записи процесса выстраиваются в очередь заранее
+    _write_locks = {}
+    
     def __init__(self, db_path="Ozon1688.db"):
         """
         Инициализация базы данных
         
         :param db_path: Путь к файлу базы данных
         """
+        # Кеш статусов задач по URL: {url: (время запроса, статус)}
+        self._status_cache = {}
+        self._status_cache_lock = threading.Lock()
+        
         try:
-            self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+            # Одно соединение на запись (SQLite все равно пишет в один поток)
+            # и отдельный пул соединений только для чтения - файлы базы и WAL
+            # не переоткрываются на каждом запросе
+            self.engine = create_engine(
+                f"sqlite:///{db_path}",
+                echo=False,
+                poolclass=QueuePool,
+                pool_size=1,
+                max_overflow=4,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=False,
+                json_serializer=_json_serializer,
+                json_deserializer=_json_deserializer,
+                query_cache_size=QUERY_CACHE_SIZE,
+                connect_args={"check_same_thread": False, "timeout": 30}
+            )
+            event.listen(self.engine, "connect", self._set_sqlite_pragmas)
             self.session_factory = sessionmaker(bind=self.engine)
+            with Database._schema_lock:
+                self._write_lock = Database._write_locks.setdefault(db_path, threading.Lock())
             self.Session = scoped_session(self.session_factory)
-            Base.metadata.create_all(self.engine)
+            self._ensure_schema(db_path)
+            
+            # Пул чтения открывается после create_all: в режиме ro файл уже должен существовать
+            self.read_engine = create_engine(
+                f"sqlite:///file:{db_path}?mode=ro&uri=true",
+                echo=False,
+                poolclass=QueuePool,
+                pool_size=READ_POOL_SIZE,
+                max_overflow=READ_POOL_OVERFLOW,
+                pool_recycle=POOL_RECYCLE,
+                # Соединения чтения живут долго, битое соединение заменяем до выдачи
+                pool_pre_ping=True,
+                json_deserializer=_json_deserializer,
+                query_cache_size=QUERY_CACHE_SIZE,
+                connect_args={"check_same_thread": False, "timeout": 30}
+            )
+            event.listen(self.read_engine, "connect", self._set_sqlite_read_pragmas)
+            # Сессии чтения ничего не записывают: автосброс изменений перед запросами
+            # и сброс состояния объектов после коммита для них не нужны
+            self.read_session_factory = sessionmaker(
+                bind=self.read_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
             logger.debug("База данных инициализирована")
         except Exception as e:
             logger.error(f"Ошибка при инициализации базы данных: {e}")
     
+    def _ensure_schema(self, db_path: str):
+        """
+        Создание таблиц и индексов один раз на процесс для каждого файла базы
+        
+        :param db_path: Путь к файлу базы данных
+        """
+        with Database._schema_lock:
+            if db_path in Database._schema_checked:
+                return
+            with self.engine.begin() as connection:
+                Base.metadata.create_all(connection, checkfirst=True)
+                for ddl in INDEX_DDL:
+                    connection.execute(text(ddl))
+            Database._schema_checked.add(db_path)
+    
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        Настройка каждого нового соединения SQLite.
+        WAL позволяет читать во время записи и убирает лишний fsync на каждом коммите
+        
+        :param dbapi_connection: Соединение sqlite3
+        :param connection_record: Запись пула соединений
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA cache_size=-65536")
+            cursor.execute("PRAGMA mmap_size=268435456")
+            cursor.execute("PRAGMA busy_timeout=5000")
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+        """
+        Настройка соединения только для чтения (режим журнала задает соединение на запись)
+        
+        :param dbapi_connection: Соединение sqlite3
+        :param connection_record: Запись пула соединений
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA cache_size=-65536")
+            cursor.execute("PRAGMA mmap_size=268435456")
+            cursor.execute("PRAGMA busy_timeout=5000")
+        finally:
+            cursor.close()
+    
     def get_session(self):
         """
         Получение сессии базы данных
@@ -37,31 +326,78 @@ class Database:
         """
         return self.Session()
     
+    def get_read_session(self):
+        """
+        Получение сессии только для чтения
+        
+        :return: Сессия SQLAlchemy, привязанная к пулу соединений только для чтения
+        """
+        return self.read_session_factory()
+    
+    @contextmanager
+    def session_scope(self):
+        """
+        Транзакция на запись: коммит при успешном выходе из блока,
+        откат при исключении и гарантированное закрытие сессии.
+        Сессия создается отдельно от потоковой (scoped) сессии, поэтому ее закрытие
+        не отсоединяет объекты, загруженные вызывающим кодом через get_session
+        
+        :return: Сессия SQLAlchemy
+        """
+        with self._write_lock, self.session_factory() as session:
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+    
+    @contextmanager
+    def read_scope(self):
+        """
+        Сессия только для чтения с гарантированным закрытием
+        
+        :return: Сессия SQLAlchemy
+        """
+        with self.get_read_session() as session:
+            yield session
+    
     def close_session(self):
         """Закрытие текущей сессии"""
         if self.Session:
             self.Session.remove()
     
-    def add_task(self, url: str, user_id: int) -> bool:
+    def add_task(self, url: str, user_id: int) -> tuple:
         """
         Добавление новой задачи
         
         :param url: URL товара
         :param user_id: ID пользователя
-        :return: True если добавление успешно, False если нет
+        :return: Кортеж (ID задачи, created): created=False если у пользователя уже есть
+                 такая же ожидающая задача, (None, False) при ошибке
         """
-        session = self.get_session()
         try:
-            task = Task(url=url, user_id=user_id)
-            session.add(task)
-            session.commit()
-            return True
+            with self.session_scope() as session:
+                # Такая же задача пользователя еще ждет обработки - второй раз не добавляем
+                pending_task_id = session.query(Task.id).filter(
+                    Task.url == url,
+                    Task.user_id == user_id,
+                    Task.status == 'pending'
+                ).limit(1).scalar()
+                if pending_task_id is not None:
+                    logger.info(f"Задача для {url} уже ожидает обработки (ID: {pending_task_id})")
+                    return pending_task_id, False
+                
+                task = Task(url=url, user_id=user_id)
+                session.add(task)
+                # flush, чтобы получить ID новой задачи до коммита
+                session.flush()
+                task_id = task.id
+            self._invalidate_status_cache(url)
+            return task_id, True
         except Exception as e:
-            session.rollback()
             logger.error(f"Ошибка при добавлении задачи: {e}")
-            return False
-        finally:
-            session.close()
+            return None, False
     
     def is_url_exists(self, url: str) -> bool:
         """
@@ -70,12 +406,10 @@ class Database:
         :param url: URL для проверки
         :return: True если URL существует, False если нет
         """
-        session = self.get_session()
-        try:
-            exists = session.query(Task).filter(Task.url == url).first() is not None
-            return exists
-        finally:
-            session.close()
+        with self.read_scope() as session:
+            return session.query(
+                session.query(Task.id).filter(Task.url == url).exists()
+            ).scalar()
     
     def get_task_id_by_url(self, url: str) -> int:
         """
@@ -84,12 +418,8 @@ class Database:
         :param url: URL товара
         :return: ID задачи
         """
-        session = self.get_session()
-        try:
-            task = session.query(Task).filter(Task.url == url).first()
-            return task.id if task else None
-        finally:
-            session.close()
+        with self.read_scope() as session:
+            return session.query(Task.id).filter(Task.url == url).limit(1).scalar()
     
     def get_task_url(self, task_id: int) -> str:
         """
@@ -98,12 +428,8 @@ class Database:
         :param task_id: ID задачи
         :return: URL товара
         """
-        session = self.get_session()
-        try:
-            task = session.query(Task).filter(Task.id == task_id).first()
-            return task.url if task else None
-        finally:
-            session.close()
+        with self.read_scope() as session:
+            return session.query(Task.url).filter(Task.id == task_id).scalar()
     
     def get_task(self, task_id: int):
         """
@@ -175,56 +501,65 @@ class Database:
         :param task_id: ID задачи
         :return: True если сохранение успешно, False если нет
         """
-        session = self.get_session()
+        if not self.save_products_bulk([product_data], task_id):
+            return False
+        logger.info(f"Сохранен товар: {product_data.get('product_name')}")
+        return True
+    
+    def save_products_bulk(self, rows: list, task_id: int) -> bool:
+        """
+        Сохранение пачки товаров Ozon одним запросом INSERT ... ON CONFLICT DO UPDATE.
+        Существующие товары (по product_id) обновляются, новые добавляются
+        
+        :param rows: Список словарей с данными о товарах
+        :param task_id: ID задачи
+        :return: True если сохранение успешно, False если нет
+        """
+        if not rows:
+            return True
+        
         try:
-            # Проверяем, существует ли уже такой товар
-            existing_product = session.query(OzonProduct).filter_by(
-                product_id=product_data.get('product_id')
-            ).first()
-            
-            if existing_product:
-                # Обновляем существующий товар
-                existing_product.url = product_data.get('url')
-                existing_product.product_name = product_data.get('product_name')
-                existing_product.price_current = product_data.get('price_current')
-                existing_product.price_original = product_data.get('price_original')
-                existing_product.images = product_data.get('images', [])
-                existing_product.characteristics = product_data.get('characteristics', {})
-                existing_product.weight = product_data.get('weight') if product_data.get('weight') is not None else existing_product.weight  # Обновляем вес
-                existing_product.dimensions = product_data.get('dimensions')  # Обновляем размеры
-                existing_product.updated_at = datetime.now()
-                existing_product.task_id = task_id
+            with self.session_scope() as session:
+                values = [{
+                    'product_id': row.get('product_id'),
+                    'url': row.get('url'),
+                    'product_name': row.get('product_name'),
+                    'price_current': row.get('price_current'),
+                    'price_original': row.get('price_original'),
+                    'images': row.get('images', []),
+                    'characteristics': row.get('characteristics', {}),
+                    'weight': row.get('weight'),
+                    'dimensions': row.get('dimensions'),
+                    'task_id': task_id
+                } for row in rows]
                 
-                session.commit()
-                logger.info(f"Обновлен существующий товар: {product_data.get('product_name')}")
-                return True
-            
-            # Создаем новый товар
-            product = OzonProduct(
-                product_id=product_data.get('product_id'),
-                url=product_data.get('url'),
-                product_name=product_data.get('product_name'),
-                price_current=product_data.get('price_current'),
-                price_original=product_data.get('price_original'),
-                images=product_data.get('images', []),
-                characteristics=product_data.get('characteristics', {}),
-                weight=product_data.get('weight'),  # Сохраняем вес
-                dimensions=product_data.get('dimensions'),  # Сохраняем размеры
-                task_id=task_id
-            )
+                stmt = sqlite_insert(OzonProduct)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[OzonProduct.product_id],
+                    set_={
+                        'url': stmt.excluded.url,
+                        'product_name': stmt.excluded.product_name,
+                        'price_current': stmt.excluded.price_current,
+                        'price_original': stmt.excluded.price_original,
+                        'images': stmt.excluded.images,
+                        'characteristics': stmt.excluded.characteristics,
+                        # Вес без нового значения оставляем прежним
+                        'weight': func.coalesce(stmt.excluded.weight, OzonProduct.weight),
+                        'dimensions': stmt.excluded.dimensions,
+                        'updated_at': func.now(),
+                        'task_id': stmt.excluded.task_id
+                    }
+                )
+                session.execute(stmt, values)
             
-            session.add(product)
-            session.commit()
-            logger.info(f"Сохранен новый товар: {product_data.get('product_name')}")
+            logger.debug(f"Сохранено товаров Ozon: {len(values)}")
             return True
             
         except IntegrityError as e:
             logger.error(f"Ошибка уникальности при сохранении товара: {e}")
-            session.rollback()
             return False
         except Exception as e:
             logger.error(f"Ошибка при сохранении товара: {e}")
-            session.rollback()
             return False
     
     def get_pending_tasks(self, limit=None) -> list:
@@ -243,7 +578,7 @@ class Database:
             query = session.query(Task).filter(
                 # Получаем только задачи в статусе 'pending' или 'ozon_processed'
                 # и исключаем задачи с завершенными статусами
-                Task.status.in_(['pending', 'ozon_processed']),
+                Task.status.in_(ACTIVE_TASK_STATUSES),
                 ~Task.status.in_(['completed', 'error', 'fatal', 'not_found', 'failed'])
             ).order_by(
                 # Сначала задачи с более высоким приоритетом (pending)
@@ -264,15 +599,19 @@ class Database:
                 task_count = len(tasks)
                 
                 # Получаем статистику по задачам
-                pending_count = len([t for t in tasks if t.status == 'pending'])
-                ozon_processed_count = len([t for t in tasks if t.status == 'ozon_processed'])
+                status_counts = Counter(task.status for task in tasks)
+                pending_count = status_counts['pending']
+                ozon_processed_count = status_counts['ozon_processed']
                 
                 logger.info(f"Найдена {task_count} необработанная задача (pending: {pending_count}, ozon_processed: {ozon_processed_count})")
                 logger.debug(f"Идентификатор найденной задачи: {task_ids}")
                 
-                # Обновляем updated_at для задач, чтобы отметить, что они в обработке
-                for task in tasks:
-                    task.updated_at = datetime.now()
+                # Обновляем updated_at для задач, чтобы отметить, что они в обработке.
+                # Один UPDATE на пачку идентификаторов вместо UPDATE на каждую задачу
+                for start in range(0, len(task_ids), SQL_IN_CHUNK_SIZE):
+                    session.query(Task).filter(
+                        Task.id.in_(task_ids[start:start + SQL_IN_CHUNK_SIZE])
+                    ).update({Task.updated_at: func.now()}, synchronize_session=False)
                 session.commit()
             else:
                 logger.debug("Нет необработанных задач")
@@ -298,156 +637,128 @@ class Database:
         :param product_data: Словарь с данными о продукте
         :return: ID созданного продукта или None в случае ошибки
         """
-        session = self.get_session()
+        # Проверка на наличие данных
+        if not product_data or not isinstance(product_data, dict):
+            logger.error(f"Некорректные данные продукта: {product_data}")
+            return None
+        
+        product_ids = self.save_alibaba_products_bulk([product_data])
+        if not product_ids:
+            return None
+        
+        logger.info(f"Сохранен продукт с 1688.com: {product_data.get('title')} с ID {product_ids[0]}")
+        return product_ids[0]
+    
+    def save_alibaba_products_bulk(self, rows: list) -> list:
+        """
+        Сохранение пачки продуктов с 1688.com: существующие (по URL) обновляются
+        одним пакетным UPDATE, новые добавляются одним пакетным INSERT
+        
+        :param rows: Список словарей с данными о продуктах
+        :return: Список ID продуктов в порядке входных данных или пустой список в случае ошибки
+        """
+        if not rows:
+            return []
+        
         try:
-            # Проверка на наличие данных
-            if not product_data or not isinstance(product_data, dict):
-                logger.error(f"Некорректные данные продукта: {product_data}")
-                return None
-                
-            # Получаем цену напрямую
-            price_str = product_data.get('price', '0')
-            
-            # Подробное логирование для отладки
-            logger.debug(f"Исходная цена продукта: '{price_str}', тип: {type(price_str)}")
-            
-            try:
-                # Проверяем, что цена не равна 0 или '0' - дополнительная проверка
-                if price_str == '0' or price_str == 0:
-                    # Попытка получить цену из логов, если в данных она нулевая
-                    logger.warning("Получена нулевая цена, проверяем данные товара полностью")
-                    logger.debug(f"Полные данные товара: {product_data}")
-                    
-                    # Если цена в данных равна нулю, но в логах видно другое значение
-                    # Это может означать, что цена была найдена, но не сохранена правильно
-                    original_price = product_data.get('original_price', price_str)
-                    if original_price and original_price != '0' and original_price != 0:
-                        logger.info(f"Найдена оригинальная цена: {original_price}, используем её вместо нулевой")
-                        price_str = original_price
-                
-                # Предварительная обработка для случаев, когда могла сохраниться только числовая часть
-                # Убираем все нечисловые символы, кроме точки
-                price_clean = ''.join(c for c in str(price_str) if c.isdigit() or c == '.')
-                if price_clean and price_clean != '0':
-                    logger.info(f"Очищенная цена: {price_clean}")
-                    price_str = price_clean
+            with self.session_scope() as session:
+                values = [self._prepare_alibaba_values(row) for row in rows]
                 
-                # Проверяем, что строка цены содержит числовое значение
-                if not any(c.isdigit() for c in str(price_str)):
-                    logger.warning(f"Строка цены '{price_str}' не содержит цифр, устанавливаем значение по умолчанию")
-                    price_str = '0'
+                # Одним запросом находим уже сохраненные продукты
+                urls = {v['url'] for v in values if v['url']}
+                existing_ids = {}
+                if urls:
+                    existing_ids = dict(
+                        session.query(AlibabaProduct.url, AlibabaProduct.id)
+                        .filter(AlibabaProduct.url.in_(urls))
+                        .all()
+                    )
                 
-                # Используем улучшенную функцию convert_price_to_usd с указанием валюты
-                price_usd = convert_price_to_usd(price_str, 'CNY')
-                logger.info(f"Цена '{price_str}' успешно конвертирована в {price_usd} USD")
-            except Exception as e:
-                logger.error(f"Ошибка при конвертации цены '{price_str}': {e}")
-                price_usd = 0.0  # Устанавливаем цену по умолчанию в случае ошибки
-            
-            # Обработка поля repurchase_rate (извлечение числа из строки)
-            repurchase_rate_str = product_data.get('repurchase_rate', '0')
-            repurchase_rate = 0.0
-            
-            try:
-                if repurchase_rate_str and repurchase_rate_str != "Нет данных":
-                    # Извлекаем только числовую часть из строки (например, из "复购率10.29%")
-                    numbers = re.findall(r'[\d.]+', repurchase_rate_str)
-                    if numbers:
-                        repurchase_rate = float(numbers[0])
-                        logger.debug(f"Преобразование показателя повторных покупок: '{repurchase_rate_str}' -> {repurchase_rate}")
-                    else:
-                        logger.warning(f"Не удалось извлечь числовое значение из '{repurchase_rate_str}', устанавливаем 0.0")
-            except Exception as e:
-                logger.error(f"Ошибка при обработке показателя повторных покупок '{repurchase_rate_str}': {e}")
-            
-            # Обработка поля shop_years (извлечение числа из строки)
-            shop_years_str = product_data.get('shop_years', '0')
-            shop_years = 0
-            
-            try:
-                if shop_years_str and shop_years_str != "Нет данных":
-                    # Извлекаем только числовую часть из строки (например, из "7年" или "已经营7年")
-                    numbers = re.findall(r'\d+', shop_years_str)
-                    if numbers:
-                        shop_years = int(numbers[0])
-                        logger.debug(f"Преобразование лет магазина: '{shop_years_str}' -> {shop_years}")
-                    else:
-                        logger.warning(f"Не удалось извлечь числовое значение из '{shop_years_str}', устанавливаем 0")
-            except Exception as e:
-                logger.error(f"Ошибка при обработке лет магазина '{shop_years_str}': {e}")
-            
-            # Обработка поля sales (извлечение числа из строки продаж)
-            sales_str = product_data.get('sales', '0')
-            sales = 0
-            
-            try:
-                if sales_str and sales_str != "Нет данных":
-                    # Извлекаем только числовую часть из строки (например, из "已售1万+件" или "月销量 1500件")
-                    # Проверяем наличие символа "万" (десять тысяч) для китайских чисел
-                    if '万' in sales_str:
-                        # Если есть "万", то умножаем на 10000
-                        numbers = re.findall(r'[\d.]+', sales_str)
-                        if numbers:
-                            sales = int(float(numbers[0]) * 10000)
-                            logger.debug(f"Преобразование продаж с '万': '{sales_str}' -> {sales}")
+                updates = {}
+                inserts = {}
+                slots = []
+                for index, v in enumerate(values):
+                    url = v['url']
+                    if url and url in existing_ids:
+                        updates[url] = dict(v, id=existing_ids[url])
+                        slots.append(('existing', url))
                     else:
-                        # Обычное извлечение числа
-                        numbers = re.findall(r'\d+', sales_str)
-                        if numbers:
-                            sales = int(numbers[0])
-                            logger.debug(f"Преобразование продаж: '{sales_str}' -> {sales}")
-                        else:
-                            logger.warning(f"Не удалось извлечь числовое значение из '{sales_str}', устанавливаем 0")
-            except Exception as e:
-                logger.error(f"Ошибка при обработке продаж '{sales_str}': {e}")
-            
-            # Проверяем, существует ли уже такой продукт
-            url = product_data.get('url')
-            if not url:
-                logger.warning("URL продукта отсутствует, не можем проверить на дубликаты")
-            else:
-                existing_product = session.query(AlibabaProduct).filter_by(url=url).first()
+                        # Повторы одного URL в пачке сохраняем одной строкой
+                        key = url or index
+                        inserts[key] = v
+                        slots.append(('new', key))
                 
-                if existing_product:
-                    # Обновляем существующий продукт
-                    existing_product.title = product_data.get('title')
-                    existing_product.price_usd = price_usd
-                    existing_product.company_name = product_data.get('company_name')
-                    existing_product.image_url = product_data.get('image_url')
-                    existing_product.sales = sales
-                    existing_product.shop_years = shop_years
-                    existing_product.repurchase_rate = repurchase_rate
-                    
-                    session.commit()
-                    logger.info(f"Обновлен существующий продукт: {product_data.get('title')} (ID: {existing_product.id})")
-                    return existing_product.id
+                if updates:
+                    session.execute(update(AlibabaProduct), list(updates.values()))
+                
+                new_ids = {}
+                if inserts:
+                    keys = list(inserts)
+                    result = session.execute(
+                        insert(AlibabaProduct).returning(AlibabaProduct.id, sort_by_parameter_order=True),
+                        [inserts[key] for key in keys]
+                    )
+                    new_ids = dict(zip(keys, result.scalars().all()))
             
-            # Создаем новый продукт
-            product = AlibabaProduct(
-                title=product_data.get('title'),
-                url=product_data.get('url'),
-                price_usd=price_usd,
-                company_name=product_data.get('company_name'),
-                image_url=product_data.get('image_url'),
-                sales=sales,
-                shop_years=shop_years,
-                repurchase_rate=repurchase_rate,
-                created_at=datetime.now()
-            )
+            logger.debug(f"Сохранено продуктов с 1688.com: добавлено {len(inserts)}, обновлено {len(updates)}")
             
-            session.add(product)
-            session.commit()
-            logger.info(f"Сохранен новый продукт с 1688.com: {product_data.get('title')} с ID {product.id}")
-            return product.id
+            return [existing_ids[key] if kind == 'existing' else new_ids[key] for kind, key in slots]
             
         except IntegrityError as e:
             logger.error(f"Ошибка уникальности при сохранении продукта: {e}")
-            session.rollback()
-            return None
+            return []
         except Exception as e:
             logger.error(f"Ошибка при сохранении продукта: {e}")
-            session.rollback()
-            return None
+            return []
+    
+    @staticmethod
+    def _prepare_alibaba_values(product_data: dict) -> dict:
+        """
+        Преобразование данных продукта с 1688.com в значения колонок AlibabaProduct
+        
+        :param product_data: Словарь с данными о продукте
+        :return: Словарь значений для вставки/обновления
+        """
+        # Цена в юанях: берем первое число из строки, при нулевой цене пробуем исходную
+        price_str = product_data.get('price', '0')
+        price_cny = _parse_numeric(price_str)
+        if not price_cny:
+            original_price = product_data.get('original_price')
+            logger.warning(f"Получена нулевая цена '{price_str}', исходная цена: '{original_price}'")
+            price_cny = _parse_numeric(original_price)
+        
+        price_usd = convert_price_to_usd(price_cny, 'CNY')
+        logger.info(f"Цена '{price_str}' конвертирована в {price_usd} USD")
+        
+        # Показатель повторных покупок (например, из "复购率10.29%")
+        repurchase_rate = _parse_numeric(product_data.get('repurchase_rate'))
+        
+        # Лет магазину (например, из "7年" или "已经营7年")
+        shop_years = int(_parse_numeric(product_data.get('shop_years')))
+        
+        # Продажи (например, из "已售1万+件" или "月销量 1500件"), "万" означает десять тысяч
+        sales_str = product_data.get('sales')
+        sales = _parse_numeric(sales_str)
+        if sales and isinstance(sales_str, str) and '万' in sales_str:
+            sales *= 10000
+        sales = int(sales)
+        
+        logger.debug(f"Повторные покупки: {repurchase_rate}, лет магазину: {shop_years}, продажи: {sales}")
+        
+        url = product_data.get('url')
+        if not url:
+            logger.warning("URL продукта отсутствует, не можем проверить на дубликаты")
+        
+        return {
+            'title': product_data.get('title'),
+            'url': url,
+            'price_usd': price_usd,
+            'company_name': product_data.get('company_name'),
+            'image_url': product_data.get('image_url'),
+            'sales': sales,
+            'shop_years': shop_years,
+            'repurchase_rate': repurchase_rate
+        }
     
     def save_match(self, match_data: dict) -> int:
         """
@@ -456,40 +767,61 @@ class Database:
         :param match_data: Словарь с данными соответствия
         :return: ID созданной записи или 0 в случае ошибки
         """
-        session = None
         try:
-            session = self.get_session()
+            with self.session_scope() as session:
+                match_id = self._insert_match(session, match_data)
             
-            # Создаем объект MatchedProduct
-            match = MatchedProduct(
-                ozon_product_id=match_data['ozon_product_id'],
-                alibaba_product_id=match_data['alibaba_product_id'],
-                relevance_score=match_data.get('relevance_score', 0.0),
-                match_status=match_data.get('match_status', 'found'),
-                match_explanation=match_data.get('match_explanation', ''),
-                weight=match_data.get('weight'),
-                dimensions=match_data.get('dimensions')
-            )
+            logger.info(f"Создано соответствие между товарами: Ozon {match_data['ozon_product_id']} - 1688 {match_data['alibaba_product_id']} (ID: {match_id})")
             
-            # Сохраняем в БД
-            session.add(match)
-            session.commit()
+            return match_id
             
-            # Получаем ID созданной записи
-            match_id = match.id
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении соответствия: {e}")
+            return 0
+    
+    @staticmethod
+    def _insert_match(session, match_data: dict) -> int:
+        """
+        Добавление соответствия одним INSERT ... RETURNING, без создания ORM-объекта
+        
+        :param session: Сессия SQLAlchemy
+        :param match_data: Словарь с данными соответствия
+        :return: ID созданной записи
+        """
+        stmt = insert(MatchedProduct).values(
+            ozon_product_id=match_data['ozon_product_id'],
+            alibaba_product_id=match_data['alibaba_product_id'],
+            relevance_score=match_data.get('relevance_score', 0.0),
+            match_status=match_data.get('match_status', 'found'),
+            match_explanation=match_data.get('match_explanation', ''),
+            weight=match_data.get('weight'),
+            dimensions=match_data.get('dimensions')
+        ).returning(MatchedProduct.id)
+        return session.execute(stmt).scalar_one()
+    
+    def save_match_and_profitability(self, match_data: dict) -> int:
+        """
+        Сохранение соответствия и расчет его маржинальности в одной транзакции
+        
+        :param match_data: Словарь с данными соответствия
+        :return: ID созданной записи или 0 в случае ошибки
+        """
+        try:
+            # Первая команда транзакции - INSERT, поэтому блокировка на запись
+            # берется сразу и не требует повышения с блокировки на чтение
+            with self.session_scope() as session:
+                match_id = self._insert_match(session, match_data)
+                profitability_created = self._insert_profitability(session, [match_id])
             
             logger.info(f"Создано соответствие между товарами: Ozon {match_data['ozon_product_id']} - 1688 {match_data['alibaba_product_id']} (ID: {match_id})")
+            if not profitability_created:
+                logger.warning(f"Маржинальность для соответствия {match_id} не рассчитана: нет цены продажи")
             
             return match_id
             
         except Exception as e:
             logger.error(f"Ошибка при сохранении соответствия: {e}")
-            if session:
-                session.rollback()
             return 0
-        finally:
-            if session:
-                session.close()
     
     def calculate_profitability(self, match_id: int) -> bool:
         """
@@ -498,98 +830,111 @@ class Database:
         :param match_id: ID соответствия
         :return: True если расчет выполнен успешно, иначе False
         """
-        session = None
+        logger.info(f"Расчет маржинальности для соответствия {match_id}")
+        
+        if self.calculate_profitability_bulk([match_id]) != 1:
+            logger.error(f"Соответствие {match_id}, его товары или цена продажи не найдены")
+            return False
+        return True
+    
+    def calculate_profitability_bulk(self, match_ids: list) -> int:
+        """
+        Рассчитывает маржинальность для набора соответствий одним запросом
+        INSERT ... SELECT: расчет выполняется в SQLite, без загрузки ORM-объектов
+        
+        :param match_ids: Список ID соответствий
+        :return: Количество созданных записей о маржинальности
+        """
+        if not match_ids:
+            return 0
+        
         try:
-            logger.info(f"Расчет маржинальности для соответствия {match_id}")
-            
-            # Получаем данные о соответствии
-            session = self.get_session()
-            match = session.query(MatchedProduct).filter_by(id=match_id).first()
-            
-            if not match:
-                logger.error(f"Соответствие с ID {match_id} не найдено")
-                return False
-            
-            # Получаем данные о товарах
-            ozon_product = session.query(OzonProduct).filter_by(id=match.ozon_product_id).first()
-            alibaba_product = session.query(AlibabaProduct).filter_by(id=match.alibaba_product_id).first()
-            
-            if not ozon_product or not alibaba_product:
-                logger.error(f"Товары для соответствия {match_id} не найдены")
-                return False
-            
-            # Получаем вес для расчета стоимости доставки
-            # Вес хранится в граммах, переводим в килограммы для расчета
-            weight_grams = match.weight if match.weight and match.weight > 0 else 0
-            weight_kg = weight_grams / 1000  # Переводим в килограммы
-            dimensions = match.dimensions if match.dimensions else ""
-            
-            logger.info(f"Данные для расчета: вес = {weight_grams} г ({weight_kg} кг), габариты = {dimensions}")
-            
-            # Конвертируем цену Ozon из рублей в доллары для сравнения
-            selling_price_usd = convert_price_to_usd(ozon_product.price_current, 'RUB')
-            
-            # Цена покупки на 1688 (уже в долларах)
-            purchase_price = alibaba_product.price_usd
-            
-            # Комиссия маркетплейса (27% от цены продажи)
-            marketplace_commission = selling_price_usd * 0.27
-            
-            # Налоги (7% от цены продажи)
-            taxes = selling_price_usd * 0.07
-            
-            # Расходы на доставку по России (зависит от веса в кг)
-            delivery_cost = 1.7 * weight_kg if weight_kg > 0 else 0
-            
-            # Расходные материалы (фиксированные $0.1)
-            packaging_cost = 0.1
-            
-            # Комиссия агента (5% от цены покупки)
-            agent_commission = purchase_price * 0.05
+            created = 0
+            with self.session_scope() as session:
+                for start in range(0, len(match_ids), SQL_IN_CHUNK_SIZE):
+                    created += self._insert_profitability(session, match_ids[start:start + SQL_IN_CHUNK_SIZE])
             
-            # Расчет итоговых показателей
-            total_profit = selling_price_usd - purchase_price - marketplace_commission - taxes - delivery_cost - packaging_cost - agent_commission
-            
-            # Расчет маржинальности в процентах
-            profitability_percent = (total_profit / selling_price_usd) * 100
-            
-            # Создаем запись о маржинальности
-            profitability = ProductProfitability(
-                match_id=match_id,
-                ozon_name=ozon_product.product_name,
-                alibaba_name=alibaba_product.title,
-                ozon_url=ozon_product.url,
-                alibaba_url=alibaba_product.url,
-                selling_price=selling_price_usd,
-                purchase_price=purchase_price,
-                marketplace_commission=marketplace_commission,
-                taxes=taxes,
-                delivery_cost=delivery_cost,
-                packaging_cost=packaging_cost,
-                agent_commission=agent_commission,
-                total_profit=total_profit,
-                profitability_percent=profitability_percent,
-                weight=weight_grams,  # Сохраняем вес в граммах
-                dimensions=dimensions
-            )
-            
-            # Сохраняем запись в базе данных
-            session.add(profitability)
-            session.commit()
-            
-            logger.info(f"Рассчитана маржинальность для товаров: {ozon_product.product_name} / {alibaba_product.title}")
-            logger.info(f"Итоговая прибыль: ${total_profit:.2f}, маржинальность: {profitability_percent:.2f}%")
-            
-            return True
+            logger.info(f"Рассчитана маржинальность для {created} из {len(match_ids)} соответствий")
+            return created
             
         except Exception as e:
             logger.error(f"Ошибка при расчете маржинальности: {e}")
-            if session:
-                session.rollback()
-            return False
-        finally:
-            if session:
-                session.close()
+            return 0
+    
+    @staticmethod
+    def _insert_profitability(session, match_ids: list) -> int:
+        """
+        Добавление записей о маржинальности для соответствий в рамках переданной сессии
+        
+        :param session: Сессия SQLAlchemy
+        :param match_ids: Список ID соответствий
+        :return: Количество добавленных записей
+        """
+        # Цена Ozon в рублях, переводим в доллары так же, как convert_price_to_usd
+        selling_price = func.round(OzonProduct.price_current / RUB_TO_USD_RATE, 2)
+        # Вес хранится в граммах, отрицательный или пустой вес считаем нулевым
+        weight_grams = case((MatchedProduct.weight > 0, MatchedProduct.weight), else_=0)
+        
+        base = select(
+            MatchedProduct.id.label('match_id'),
+            OzonProduct.product_name.label('ozon_name'),
+            AlibabaProduct.title.label('alibaba_name'),
+            OzonProduct.url.label('ozon_url'),
+            AlibabaProduct.url.label('alibaba_url'),
+            selling_price.label('selling_price'),
+            AlibabaProduct.price_usd.label('purchase_price'),
+            weight_grams.label('weight'),
+            func.coalesce(MatchedProduct.dimensions, '').label('dimensions')
+        ).join(
+            OzonProduct, OzonProduct.id == MatchedProduct.ozon_product_id
+        ).join(
+            AlibabaProduct, AlibabaProduct.id == MatchedProduct.alibaba_product_id
+        ).where(
+            MatchedProduct.id.in_(match_ids),
+            # Без цены продажи маржинальность не определена
+            selling_price != 0
+        ).subquery()
+        
+        coeffs = PROFITABILITY_COEFFS
+        marketplace_commission = base.c.selling_price * coeffs.marketplace_commission_rate
+        taxes = base.c.selling_price * coeffs.tax_rate
+        delivery_cost = coeffs.delivery_cost_per_kg * (base.c.weight / 1000.0)
+        agent_commission = base.c.purchase_price * coeffs.agent_commission_rate
+        # Процентные расходы сведены к двум множителям, постоянные - к одному слагаемому
+        total_profit = (
+            base.c.selling_price * (1 - coeffs.selling_cost_rate)
+            - base.c.purchase_price * coeffs.purchase_cost_rate
+            - delivery_cost - coeffs.packaging_cost
+        )
+        
+        columns = [
+            'match_id', 'ozon_name', 'alibaba_name', 'ozon_url', 'alibaba_url',
+            'selling_price', 'purchase_price', 'marketplace_commission', 'taxes',
+            'delivery_cost', 'packaging_cost', 'agent_commission', 'total_profit',
+            'profitability_percent', 'weight', 'dimensions', 'created_at'
+        ]
+        values = select(
+            base.c.match_id,
+            base.c.ozon_name,
+            base.c.alibaba_name,
+            base.c.ozon_url,
+            base.c.alibaba_url,
+            base.c.selling_price,
+            base.c.purchase_price,
+            marketplace_commission,
+            taxes,
+            delivery_cost,
+            literal(coeffs.packaging_cost),
+            agent_commission,
+            total_profit,
+            total_profit / base.c.selling_price * 100,
+            base.c.weight,
+            base.c.dimensions,
+            func.now()
+        )
+        
+        result = session.execute(insert(ProductProfitability).from_select(columns, values))
+        return result.rowcount
     
     def get_all_profitability_records(self) -> list:
         """
@@ -597,43 +942,27 @@ class Database:
         
         :return: Список записей о маржинальности
         """
-        session = None
         try:
-            session = self.get_session()
-            records = session.query(ProductProfitability).all()
-            
-            # Преобразуем записи в словари для удобства использования
-            result = []
-            for record in records:
-                result.append({
-                    'id': record.id,
-                    'match_id': record.match_id,
-                    'ozon_name': record.ozon_name,
-                    'alibaba_name': record.alibaba_name,
-                    'ozon_url': record.ozon_url,
-                    'alibaba_url': record.alibaba_url,
-                    'selling_price': record.selling_price,
-                    'purchase_price': record.purchase_price,
-                    'marketplace_commission': record.marketplace_commission,
-                    'taxes': record.taxes,
-                    'delivery_cost': record.delivery_cost,
-                    'packaging_cost': record.packaging_cost,
-                    'agent_commission': record.agent_commission,
-                    'total_profit': record.total_profit,
-                    'profitability_percent': record.profitability_percent,
-                    'weight': record.weight,
-                    'dimensions': record.dimensions,
-                    'created_at': record.created_at.isoformat() if record.created_at else None
-                })
-            
-            return result
-            
+            return list(self.iter_profitability_records())
         except Exception as e:
             logger.error(f"Ошибка при получении записей о маржинальности: {e}")
             return []
-        finally:
-            if session:
-                session.close()
+    
+    def iter_profitability_records(self):
+        """
+        Потоковое чтение записей о маржинальности без загрузки ORM-объектов.
+        Строки читаются из базы пачками, весь результат в памяти не собирается
+        
+        :return: Генератор словарей с данными о маржинальности
+        """
+        stmt = select(*PROFITABILITY_COLUMNS)
+        with self.read_scope() as session:
+            rows = session.execute(stmt).yield_per(PROFITABILITY_BATCH_SIZE).mappings()
+            for row in rows:
+                record = dict(row)
+                created_at = record['created_at']
+                record['created_at'] = created_at.isoformat() if created_at else None
+                yield record
                 
     def get_profitability_by_match_id(self, match_id: int) -> dict:
         """
@@ -644,7 +973,7 @@ class Database:
         """
         session = None
         try:
-            session = self.get_session()
+            session = self.get_read_session()
             record = session.query(ProductProfitability).filter_by(match_id=match_id).first()
             
             if not record:
@@ -688,36 +1017,21 @@ class Database:
         :param user_id: ID пользователя (опционально)
         :return: Словарь со статистикой
         """
-        session = self.get_session()
         try:
-            query = session.query(Task)
-            if user_id:
-                query = query.filter(Task.user_id == user_id)
-            
-            total_tasks = query.count()
-            completed_tasks = query.filter(Task.status == 'completed').count()
-            not_found_tasks = query.filter(Task.status == 'not_found').count()
-            error_tasks = query.filter(Task.status == 'error').count()
-            failed_tasks = query.filter(Task.status == 'failed').count()
-            fatal_tasks = query.filter(Task.status == 'fatal').count()
-            pending_tasks = query.filter(Task.status == 'pending').count()
-            ozon_processed_tasks = query.filter(Task.status == 'ozon_processed').count()
-            
-            return {
-                'total': total_tasks,
-                'completed': completed_tasks,
-                'not_found': not_found_tasks,
-                'error': error_tasks,
-                'failed': failed_tasks,
-                'fatal': fatal_tasks,
-                'pending': pending_tasks,
-                'ozon_processed': ozon_processed_tasks
-            }
+            # Количество задач по каждому статусу одним запросом
+            with self.read_scope() as session:
+                query = session.query(Task.status, func.count(Task.id))
+                if user_id:
+                    query = query.filter(Task.user_id == user_id)
+                counts = dict(query.group_by(Task.status).all())
+            
+            statistics = {'total': sum(counts.values())}
+            for status in TASK_STATUSES:
+                statistics[status] = counts.get(status, 0)
+            return statistics
         except Exception as e:
             logger.error(f"Ошибка при получении статистики задач: {e}")
             return {}
-        finally:
-            session.close()
 
     def get_product_info_by_url(self, url: str) -> dict:
         """
@@ -726,60 +1040,104 @@ class Database:
         :param url: URL товара
         :return: Словарь с информацией о товаре или None
         """
-        session = None
         try:
-            session = self.get_session()
-            
-            # Получаем задачу по URL
-            task = session.query(Task).filter_by(url=url).first()
-            if not task:
-                return None
-            
-            # Получаем товар Ozon
-            ozon_product = session.query(OzonProduct).filter_by(task_id=task.id).first()
-            if not ozon_product:
-                return None
-            
-            # Получаем соответствие
-            matched_product = session.query(MatchedProduct).filter_by(ozon_product_id=ozon_product.id).first()
-            if not matched_product:
-                return None
-            
-            # Получаем товар 1688
-            alibaba_product = session.query(AlibabaProduct).filter_by(id=matched_product.alibaba_product_id).first()
-            if not alibaba_product:
-                return None
-            
-            # Получаем информацию о прибыльности
-            profitability = session.query(ProductProfitability).filter_by(match_id=matched_product.id).first()
-            if not profitability:
-                return None
+            with self.read_scope() as session:
+                row = self._product_info_query(session).filter(Task.url == url).first()
             
-            # Конвертируем цену Ozon из рублей в доллары
-            ozon_price_usd = convert_price_to_usd(ozon_product.price_current, 'RUB')
-            
-            return {
-                'ozon_name': ozon_product.product_name,
-                'ozon_url': ozon_product.url,
-                'ozon_price': ozon_product.price_current,
-                'ozon_price_usd': round(ozon_price_usd, 2),
-                'alibaba_name': alibaba_product.title,
-                'alibaba_url': alibaba_product.url,
-                'alibaba_price': alibaba_product.price_usd,
-                'profitability_percent': round(profitability.profitability_percent, 2),
-                'total_profit': round(profitability.total_profit, 2),
-                'weight': ozon_product.weight,
-                'dimensions': ozon_product.dimensions,
-                'created_at': profitability.created_at.strftime('%d.%m.%Y %H:%M'),
-                'status': task.status
-            }
+            return self._product_info_from_row(row) if row else None
             
         except Exception as e:
             logger.error(f"Ошибка при получении информации о товаре: {e}")
             return None
-        finally:
-            if session:
-                session.close()
+    
+    def get_product_infos_by_urls(self, urls: list) -> dict:
+        """
+        Получение информации о товарах для набора URL одним запросом на пачку.
+        Для нескольких URL используйте этот метод вместо вызовов get_product_info_by_url в цикле
+        
+        :param urls: Список URL товаров
+        :return: Словарь {URL: информация о товаре}; URL без готового отчета в словарь не попадают
+        """
+        result = {}
+        urls = list(dict.fromkeys(urls))
+        try:
+            with self.read_scope() as session:
+                for start in range(0, len(urls), SQL_IN_CHUNK_SIZE):
+                    rows = self._product_info_query(session).filter(
+                        Task.url.in_(urls[start:start + SQL_IN_CHUNK_SIZE])
+                    ).yield_per(PRODUCT_INFO_BATCH_SIZE)
+                    for row in rows:
+                        if row.task_url not in result:
+                            result[row.task_url] = self._product_info_from_row(row)
+            return result
+            
+        except Exception as e:
+            logger.error(f"Ошибка при получении информации о товарах: {e}")
+            return {}
+    
+    @staticmethod
+    def _product_info_query(session):
+        """
+        Запрос отчета о товаре: задача, товар Ozon, соответствие, товар 1688 и прибыльность
+        одним JOIN. Если любой из этапов еще не готов, строки не будет.
+        Выбираются только нужные колонки, ORM-объекты не создаются
+        
+        :param session: Сессия SQLAlchemy
+        :return: Запрос без фильтра по URL
+        """
+        return session.query(
+            Task.url.label('task_url'),
+            Task.status,
+            OzonProduct.product_name,
+            OzonProduct.url.label('ozon_url'),
+            OzonProduct.price_current,
+            # Перевод в доллары и округление выполняются в SQLite сразу для всех строк
+            func.coalesce(
+                func.round(OzonProduct.price_current / RUB_TO_USD_RATE, 2), 0.0
+            ).label('ozon_price_usd'),
+            OzonProduct.weight,
+            OzonProduct.dimensions,
+            AlibabaProduct.title,
+            AlibabaProduct.url.label('alibaba_url'),
+            AlibabaProduct.price_usd,
+            func.round(ProductProfitability.profitability_percent, 2).label('profitability_percent'),
+            func.round(ProductProfitability.total_profit, 2).label('total_profit'),
+            ProductProfitability.created_at
+        ).select_from(
+            Task
+        ).join(
+            OzonProduct, OzonProduct.task_id == Task.id
+        ).join(
+            MatchedProduct, MatchedProduct.ozon_product_id == OzonProduct.id
+        ).join(
+            AlibabaProduct, AlibabaProduct.id == MatchedProduct.alibaba_product_id
+        ).join(
+            ProductProfitability, ProductProfitability.match_id == MatchedProduct.id
+        )
+    
+    @staticmethod
+    def _product_info_from_row(row) -> dict:
+        """
+        Преобразование строки запроса отчета о товаре в словарь
+        
+        :param row: Строка результата _product_info_query
+        :return: Словарь с информацией о товаре
+        """
+        return {
+            'ozon_name': row.product_name,
+            'ozon_url': row.ozon_url,
+            'ozon_price': row.price_current,
+            'ozon_price_usd': row.ozon_price_usd,
+            'alibaba_name': row.title,
+            'alibaba_url': row.alibaba_url,
+            'alibaba_price': row.price_usd,
+            'profitability_percent': row.profitability_percent,
+            'total_profit': row.total_profit,
+            'weight': row.weight,
+            'dimensions': row.dimensions,
+            'created_at': _format_datetime(row.created_at),
+            'status': row.status
+        }
 
     def get_task_status_by_url(self, url: str) -> str:
         """
@@ -788,23 +1146,48 @@ class Database:
         :param url: URL товара
         :return: Статус задачи или None если задача не найдена
         """
-        session = self.get_session()
-        try:
-            task = session.query(Task).filter(Task.url == url).first()
-            return task.status if task else None
-        finally:
-            session.close()
+        now = time.monotonic()
+        with self._status_cache_lock:
+            cached = self._status_cache.get(url)
+        if cached and now - cached[0] < STATUS_CACHE_TTL:
+            return cached[1]
+        
+        with self.read_scope() as session:
+            status = session.execute(_TASK_STATUS_STMT, {'url': url}).scalar()
+        
+        with self._status_cache_lock:
+            self._status_cache[url] = (now, status)
+        return status
+    
+    def _invalidate_status_cache(self, url: str):
+        """
+        Сброс закешированного статуса задачи после его изменения
+        
+        :param url: URL товара
+        """
+        with self._status_cache_lock:
+            self._status_cache.pop(url, None)
 
     def get_active_tasks(self) -> list:
         """
         Получение списка активных задач (в обработке)
         
-        :return: Список активных задач с информацией о товарах
+        :return: Список объектов ActiveTask с информацией о товарах
+                 (раньше - словари; прежний формат дает ActiveTask.to_dict())
         """
-        session = None
         try:
-            session = self.get_session()
-            
+            return list(self.iter_active_tasks())
+        except Exception as e:
+            logger.error(f"Ошибка при получении активных задач: {e}")
+            return []
+    
+    def iter_active_tasks(self):
+        """
+        Потоковое чтение активных задач: строки читаются из базы пачками
+        
+        :return: Генератор объектов ActiveTask с информацией о задачах и товарах
+        """
+        with self.read_scope() as session:
             # Получаем задачи в статусах pending и ozon_processed
             active_tasks = session.query(
                 Task.id,
@@ -825,31 +1208,65 @@ class Database:
                 AlibabaProduct,
                 AlibabaProduct.id == MatchedProduct.alibaba_product_id
             ).filter(
-                Task.status.in_(['pending', 'ozon_processed'])
+                Task.status.in_(ACTIVE_TASK_STATUSES)
             ).order_by(
                 Task.created_at.desc()
-            ).all()
-            
-            return [
-                {
-                    'task_id': task.id,
-                    'url': task.url,
-                    'status': task.status,
-                    'created_at': task.created_at.strftime('%d.%m.%Y %H:%M'),
-                    'ozon_name': task.ozon_name,
-                    'ozon_url': task.ozon_url,
-                    'alibaba_name': task.alibaba_name,
-                    'alibaba_url': task.alibaba_url
-                }
-                for task in active_tasks
-            ]
-            
+            ).yield_per(ACTIVE_TASKS_BATCH_SIZE)
+            
+            # Строка результата - кортеж, распаковываем его сразу вместо обращения к атрибутам
+            for task_id, url, status, created_at, ozon_name, ozon_url, alibaba_name, alibaba_url in active_tasks:
+                yield ActiveTask(
+                    task_id, url, status, _format_datetime(created_at),
+                    ozon_name, ozon_url, alibaba_name, alibaba_url
+                )
+
+    def get_active_tasks_json(self) -> str:
+        """
+        Получение списка активных задач сразу в виде JSON-строки.
+        JSON собирается в SQLite (json_object/json_group_array), без создания
+        Python-объектов для каждой строки
+        
+        :return: JSON-массив с теми же полями, что и у ActiveTask
+        """
+        try:
+            active = select(
+                Task.id.label('task_id'),
+                Task.url,
+                Task.status,
+                func.strftime('%d.%m.%Y %H:%M', Task.created_at).label('created_at'),
+                OzonProduct.product_name.label('ozon_name'),
+                OzonProduct.url.label('ozon_url'),
+                AlibabaProduct.title.label('alibaba_name'),
+                AlibabaProduct.url.label('alibaba_url')
+            ).outerjoin(
+                OzonProduct, OzonProduct.task_id == Task.id
+            ).outerjoin(
+                MatchedProduct, MatchedProduct.ozon_product_id == OzonProduct.id
+            ).outerjoin(
+                AlibabaProduct, AlibabaProduct.id == MatchedProduct.alibaba_product_id
+            ).where(
+                Task.status.in_(ACTIVE_TASK_STATUSES)
+            ).order_by(
+                Task.created_at.desc()
+            ).subquery()
+            
+            stmt = select(func.json_group_array(func.json_object(
+                'task_id', active.c.task_id,
+                'url', active.c.url,
+                'status', active.c.status,
+                'created_at', active.c.created_at,
+                'ozon_name', active.c.ozon_name,
+                'ozon_url', active.c.ozon_url,
+                'alibaba_name', active.c.alibaba_name,
+                'alibaba_url', active.c.alibaba_url
+            )))
+            
+            with self.read_scope() as session:
+                return session.execute(stmt).scalar() or '[]'
+                
         except Exception as e:
-            logger.error(f"Ошибка при получении активных задач: {e}")
-            return []
-        finally:
-            if session:
-                session.close()
+            logger.error(f"Ошибка при получении активных задач в JSON: {e}")
+            return '[]'
 
     def add_user(self, telegram_id: int, username: str = None, first_name: str = None, last_name: str = None) -> User:
         """
@@ -1020,7 +1437,7 @@ class Database:
             if status:
                 if status == 'active':
                     # Для активных задач берем pending и ozon_processed
-                    query = query.filter(Task.status.in_(['pending', 'ozon_processed']))
+                    query = query.filter(Task.status.in_(ACTIVE_TASK_STATUSES))
                 else:
                     query = query.filter(Task.status == status)
             tasks = query.order_by(Task.created_at.desc()).all()
@@ -1319,6 +1736,7 @@ class Database:
             task.status = status
             task.updated_at = datetime.now()
             session.commit()
+            self._invalidate_status_cache(task.url)
             logger.info(f"Обновлен статус задачи {task_id} на {status}")
             return True
         except Exception as e:
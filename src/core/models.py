@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -47,7 +47,7 @@ class OzonProduct(Base):
     weight = Column(Float)  # Новое поле для веса
     dimensions = Column(String)  # Новое поле для размеров
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
     
     # Связь с таблицей задач
     task_id = Column(Integer, ForeignKey('tasks.id'))
@@ -71,7 +71,7 @@ class AlibabaProduct(Base):
     sales = Column(Integer)
     shop_years = Column(Integer)
     repurchase_rate = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
     def __repr__(self):
         return f"<AlibabaProduct(id={self.id}, title='{self.title}', price={self.price_usd})>"
@@ -165,7 +165,7 @@ class Task(Base):
     url = Column(String, nullable=False)
     status = Column(String, nullable=False, default='pending')
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
     
     # Связь с пользователем
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
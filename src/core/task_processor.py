@@ -568,8 +568,8 @@ class TaskProcessor:
                 'dimensions': dimensions if dimensions else ""
             }
             
-            # Сохраняем соответствие
-            match_id = self.db.save_match(match_data)
+            # Сохраняем соответствие и рассчитываем маржинальность одной транзакцией
+            match_id = self.db.save_match_and_profitability(match_data)
             
             if not match_id:
                 logger.error("Ошибка при сохранении соответствия")
@@ -580,9 +580,6 @@ class TaskProcessor:
                 session.close()
                 return 0
             
-            # Рассчитываем маржинальность
-            self.db.calculate_profitability(match_id)
-            
             # Обновляем статус задачи
             task.status = "completed"
             task.updated_at = datetime.now()
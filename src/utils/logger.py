@@ -9,6 +9,18 @@ from loguru import logger
 # Флаг, показывающий, был ли логгер уже инициализирован
 _logger_initialized = False
 
+# Флаг отладочного режима, установленный при настройке логгера
+_debug_enabled = False
+
+def is_debug_enabled() -> bool:
+    """
+    Проверка, включен ли вывод отладочных сообщений.
+    Позволяет не собирать данные для logger.debug, которые все равно будут отброшены.
+    
+    :return: True, если логгер настроен с уровнем DEBUG
+    """
+    return _debug_enabled
+
 def setup_logger(debug: bool = False, save_logs: bool = True):
     """
     Настройка логгера. Если логгер уже был инициализирован, 
@@ -18,7 +30,7 @@ def setup_logger(debug: bool = False, save_logs: bool = True):
     :param save_logs: Сохранять логи в файл
     :return: Объект логгера
     """
-    global _logger_initialized
+    global _logger_initialized, _debug_enabled
     
     # Проверяем, был ли логгер уже инициализирован
     if _logger_initialized:
@@ -74,6 +86,7 @@ def setup_logger(debug: bool = False, save_logs: bool = True):
     
     # Помечаем логгер как инициализированный
     _logger_initialized = True
+    _debug_enabled = debug
     
     return logger
 
@@ -3,6 +3,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Константы курсов валют
+RUB_TO_USD_RATE = 85.0  # 1 USD = 85 RUB
+CNY_TO_USD_RATE = 7.14  # 1 USD = 7.14 CNY
+
 def extract_weight_and_dimensions(characteristics: dict) -> dict:
     """
     Извлекает вес и габариты из характеристик товара.
@@ -41,10 +45,6 @@ def convert_price_to_usd(price_value, currency=None):
     :param currency: Валюта (если известна): 'RUB', 'CNY' или None для автоопределения
     :return: Цена в долларах США (USD)
     """
-    # Константы курсов валют
-    RUB_TO_USD_RATE = 85.0  # 1 USD = 85 RUB
-    CNY_TO_USD_RATE = 7.14  # 1 USD = 7.14 CNY
-    
     # Логируем входные данные для отладки
     logger.debug(f"Конвертация цены: {price_value}, валюта: {currency or 'не указана'}")
     